@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# Inclusive upper edges, in whole days, of the stock ageing buckets. Pallets
+# older than the last edge fall in an open-ended bucket.
+AGE_BUCKET_EDGES = (7, 15, 30)
+
+# Pallets older than this edge count as high ageing; must be one of the bucket edges
+HIGH_AGEING_DAYS = 30
+
+
+def check_edges(edges):
+    """Bucket edges as a tuple of increasing non-negative whole days"""
+    edges = tuple(int(edge) for edge in edges)
+    if not edges or edges[0] < 0 or any(a >= b for a, b in zip(edges, edges[1:])):
+        raise ValueError(f"ageing bucket edges must be increasing non-negative days, got {edges}")
+    return edges
+
+
+def bucket_labels(edges=AGE_BUCKET_EDGES):
+    """'0-7 days', '8-15 days', ..., '30+ days' for the bucket edges"""
+    lows = [0] + [edge + 1 for edge in edges[:-1]]
+    return [f"{low}-{edge} days" for low, edge in zip(lows, edges)] + [f"{edges[-1]}+ days"]
+
+
+def age_days(load_datetime, reference):
+    """Whole calendar days from each load date to the reference date, NA for missing loads"""
+    return (pd.Timestamp(reference).normalize() - load_datetime.dt.normalize()).dt.days
+
+
+def bucket_codes(ages, edges=AGE_BUCKET_EDGES):
+    """Bucket of each age: 0 up to the first edge, len(edges) past the last"""
+    return np.searchsorted(np.asarray(edges), np.asarray(ages), side='left')
+
+
+def high_ageing_bucket(edges=AGE_BUCKET_EDGES, threshold=HIGH_AGEING_DAYS):
+    """First bucket whose pallets count as high ageing"""
+    if threshold not in edges:
+        raise ValueError(f"high ageing threshold {threshold} is not one of the bucket edges {edges}")
+    return edges.index(threshold) + 1
+
+
+def ageing_table(cells, edges=AGE_BUCKET_EDGES, by=None):
+    """Pallets per ageing bucket from stock cells (age_days, pallets)
+
+    Returns a Series indexed by bucket label, or with `by` a frame with one
+    column per value of that cell column.
+    """
+    labels = bucket_labels(edges)
+    codes = bucket_codes(cells['age_days'], edges)
+    if by is None:
+        counts = np.bincount(codes, weights=cells['pallets'], minlength=len(labels)).astype(np.int64)
+        return pd.Series(counts, index=pd.Index(labels, name='age_range'), name='pallets')
+    buckets = pd.Categorical.from_codes(codes, labels)
+    table = cells['pallets'].groupby([buckets, cells[by]], observed=True).sum().unstack(fill_value=0)
+    table = table.reindex(labels, fill_value=0).rename_axis(index='age_range', columns=by)
+    table.columns = table.columns.astype(object)
+    return table
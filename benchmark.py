@@ -0,0 +1,280 @@
+"""Synthetic scale data and stage-by-stage timings for the dashboard pipeline
+
+    python benchmark.py --scale 10 --output bench/results-10x.json
+
+Exports are generated by resampling the real exports, so the column layout,
+BOM headers, date formats, status mix and outlier rate match production.
+Each multiple of the real row count adds one more copy of the real date span
+further back in time, so 10x is roughly ten times the history.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from ageing import ageing_table
+from charts import COLORS, grouped_bar_figure, line_figure, lollipop_figure, pie_figure
+from cube import build_cube, cube_kpis, product_type_matrix, rollup, slice_cube
+from dataset import DatasetLoader
+from engine import Snapshot, build_report
+from filters import mission_mask, take_columns
+from profiling import PeakMemory, start_memory_tracing, stop_memory_tracing
+from ingest import (
+    DATE_FORMAT, MISSION_TYPES, RENAMED_COLUMNS, SOURCES, TIMESTAMP_COLUMNS,
+    IncrementalLoader, build_missions, month_index, month_key, parse_timestamps, read_export,
+)
+from outliers import OUTLIER_TABLE_COLUMNS, classify_outliers, outlier_page
+from result_cache import normalize_filter_state
+from schema import MISSION_SCHEMA, apply_schema
+from sketches import build_sketches, latency_percentiles
+from stock import StockSnapshot, read_stock
+from timeseries import aggregate
+
+BENCH_DATA_DIR = "bench_data"
+
+# Exports written with a UTF-8 byte order mark, as the WMS does
+BOM_SOURCES = set(MISSION_TYPES)
+
+
+def _date_columns(name):
+    return [date_col for date_col, _ in TIMESTAMP_COLUMNS[name].values()]
+
+
+def _shift_dates(values, days):
+    """Shift dd-mm-yyyy strings back by `days` per row, parsing each distinct date once"""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object), format=DATE_FORMAT, errors='coerce')
+    shifted = parsed.values[np.maximum(codes, 0)] - days.astype('timedelta64[D]')
+    formatted = pd.DatetimeIndex(shifted).strftime(DATE_FORMAT).to_numpy(dtype=object)
+    missing = (codes < 0) | pd.isna(formatted)
+    formatted[missing] = np.asarray(values, dtype=object)[missing]
+    return formatted
+
+
+def generate_export(name, scale, source_dir=".", out_dir=BENCH_DATA_DIR, seed=0):
+    """Write one synthetic export with round(scale * real rows) rows and return the row count"""
+    path = os.path.join(source_dir, SOURCES[name])
+    with open(path, encoding='utf-8-sig') as f:
+        header = f.readline()
+    real = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    rng = np.random.default_rng(seed)
+    rows = int(round(len(real) * scale))
+    sample = real.iloc[rng.integers(0, len(real), rows)].reset_index(drop=True)
+
+    if name == 'stock':
+        # Stock is a snapshot of the current pallets: more rows, same load dates
+        sample['CURRENT_STOCK_DETAILS_ID'] = np.arange(1, rows + 1).astype(str)
+    else:
+        # Row block k holds the k-th copy of the real date span, counted backwards
+        dates = pd.to_datetime(real[_date_columns(name)[0]], format=DATE_FORMAT, errors='coerce')
+        span_days = (dates.max() - dates.min()).days + 1 if dates.notna().any() else 0
+        blocks = np.arange(rows) // max(len(real), 1)
+        days = (blocks * span_days).astype(np.int64)
+        for column in _date_columns(name):
+            sample[column] = _shift_dates(sample[column], days)
+        # Oldest history first, as the exports are appended in time order
+        sample = sample.iloc[np.argsort(-blocks, kind='stable')]
+
+    os.makedirs(out_dir, exist_ok=True)
+    encoding = 'utf-8-sig' if name in BOM_SOURCES else 'utf-8'
+    with open(os.path.join(out_dir, SOURCES[name]), 'w', encoding=encoding, newline='') as f:
+        f.write(header)
+        sample.to_csv(f, header=False, index=False, lineterminator='\n')
+    return rows
+
+
+def generate_exports(scale, source_dir=".", out_dir=BENCH_DATA_DIR, seed=0):
+    """Write synthetic copies of all exports and return their row counts"""
+    return {name: generate_export(name, scale, source_dir, out_dir, seed + i) for i, name in enumerate(SOURCES)}
+
+
+class StageTimer:
+    """Run pipeline stages one at a time, recording wall time, throughput and peak memory
+
+    Allocation tracing slows the traced code down several times, so with
+    trace_memory each stage runs a second time under tracemalloc and only
+    the untraced run is timed. Stages must therefore be safe to repeat.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = []
+
+    def run(self, stage, rows, func, *args):
+        """Time func(*args); rows=None counts the rows of the returned frame"""
+        start = time.perf_counter()
+        value = func(*args)
+        seconds = time.perf_counter() - start
+        if rows is None:
+            rows = len(value)
+        peak = None
+        if self.trace_memory:
+            start_memory_tracing()
+            memory = PeakMemory()
+            func(*args)
+            memory.close()
+            stop_memory_tracing()
+            peak = round(memory.bytes() / 2**20, 2)
+        self.results.append({
+            'stage': stage,
+            'rows': int(rows),
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(rows / seconds) if seconds > 0 else None,
+            'peak_mib': peak,
+        })
+        return value
+
+
+def _read_csv(name, path):
+    with open(path, 'rb') as f:
+        return read_export(name, f.read())
+
+
+def _normalize_status(df, mission_type):
+    df = df.rename(columns=RENAMED_COLUMNS[mission_type])
+    df['MISSION_STATUS'] = df['MISSION_STATUS'].str.upper()
+    return df
+
+
+def _classify(df, mission_type):
+    df['outlier_reason'] = classify_outliers(df, mission_type)
+    df['is_outlier'] = df['outlier_reason'].notna()
+    df['month_key'] = month_key(df['created_datetime'])
+    return df
+
+
+def _compact(df):
+    # On a shallow copy, so the repeated (memory traced) run converts again
+    return apply_schema(df.copy(deep=False), MISSION_SCHEMA)
+
+
+def _trend_figures(missions):
+    series = aggregate(missions, 'month')
+    series['downtime_log'] = series['downtime'].clip(lower=0.01)
+    figures = [
+        lollipop_figure(s['label'], s['downtime_log'], [f"{v:.2f}%" for v in s['downtime']]).to_json()
+        for s in (series[series['mission_type'] == t] for t in ('infeed', 'outfeed'))
+    ]
+    throughput = series.pivot(index='label', columns='mission_type', values='completed').fillna(0)
+    figures.append(line_figure(throughput.index, {t: throughput[t] for t in throughput.columns},
+                               [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']]).to_json())
+    return figures
+
+
+def _mission_figures(cells, kpis):
+    status = rollup(cells, 'MISSION_STATUS')['count']
+    matrix = product_type_matrix(cells)
+    return [
+        pie_figure(status.index, status.values, [COLORS['blue_green'], COLORS['vermillion']]).to_json(),
+        pie_figure([t.capitalize() for t in MISSION_TYPES], [kpis['type_totals'][t] for t in MISSION_TYPES],
+                   [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']], hole=0.5).to_json(),
+        grouped_bar_figure(matrix.index, {t: matrix[t] for t in MISSION_TYPES},
+                           [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']]).to_json(),
+    ]
+
+
+def _outlier_view(missions, mask):
+    positions = np.flatnonzero(mask & missions['is_outlier'].to_numpy())
+    outliers = take_columns(missions, positions, OUTLIER_TABLE_COLUMNS.values())
+    counts = outliers['outlier_reason'].value_counts()
+    return pie_figure(counts.index, counts.values, [COLORS['vermillion']]).to_json(), outlier_page(outliers)
+
+
+def _stock_figure(stock):
+    ageing = ageing_table(stock.cells)
+    return grouped_bar_figure(ageing.index, {'Pallets': ageing.values}, [COLORS['sky_blue']]).to_json()
+
+
+def _cold_load(data_dir, cache_dir):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return IncrementalLoader(data_dir, cache_dir).tables()
+
+
+def run_benchmark(data_dir=BENCH_DATA_DIR, trace_memory=True):
+    """Time every pipeline stage on the exports in data_dir and return the stage results"""
+    timer = StageTimer(trace_memory)
+    frames = {}
+    for name in MISSION_TYPES:
+        path = os.path.join(data_dir, SOURCES[name])
+        df = timer.run(f'{name}: read csv', None, _read_csv, name, path)
+        df = timer.run(f'{name}: timestamps and duration', len(df), parse_timestamps, df, name)
+        df = timer.run(f'{name}: status normalization', len(df), _normalize_status, df, name)
+        df = timer.run(f'{name}: outlier classification', len(df), _classify, df, name)
+        frames[name] = timer.run(f'{name}: schema', len(df), _compact, df)
+    stock_path = os.path.join(data_dir, SOURCES['stock'])
+    pallets = timer.run('stock: stream and filter csv', None, read_stock, stock_path)
+    stock = timer.run('stock: area and product indices', len(pallets), StockSnapshot, pallets)
+
+    rows = sum(len(df) for df in frames.values())
+    missions = timer.run('build mission table', rows, build_missions, frames)
+    cube = timer.run('build cube', rows, build_cube, missions)
+    sketches = timer.run('build latency sketches', rows, build_sketches, missions)
+
+    cache_dir = os.path.join(data_dir, '.cache')
+    timer.run('load: cold (parse + parquet cache)', rows, _cold_load, data_dir, cache_dir)
+    timer.run('load: warm (parquet cache)', rows, lambda: IncrementalLoader(data_dir, cache_dir).tables())
+    dataset_loader = DatasetLoader(data_dir, cache_dir)
+    dataset_loader.tables()  # writes the month partitions once
+    dataset = dataset_loader.view
+    timer.run('load: warm dataset (cube, sketches and stock only)', rows, lambda: DatasetLoader(data_dir, cache_dir).tables())
+
+    index = month_index(missions)
+    months = sorted(index)[-2:]
+    timer.run('dataset: read 2 months', None, dataset.read, months)
+    timer.run('dataset: read 2 months, outlier columns', None, lambda: dataset.read(
+        months, columns=list(OUTLIER_TABLE_COLUMNS.values()), outliers_only=True
+    ))
+    mask = timer.run('filter: mask', rows, mission_mask, missions, index, months, ('infeed', 'outfeed'), (), 'BOTH')
+    timer.run('filter: take columns', int(mask.sum()), take_columns, missions, np.flatnonzero(mask),
+              OUTLIER_TABLE_COLUMNS.values())
+    cells = timer.run('kpis: slice cube', len(cube), slice_cube, cube, months)
+    kpis = timer.run('kpis: compute', len(cells), cube_kpis, cells)
+    sketch_cells = slice_cube(sketches, months)
+    timer.run('latency: merge sketches per area', len(sketch_cells), latency_percentiles, sketch_cells, ('AREA_ID',))
+    snapshot = Snapshot(missions, stock, cube, sketches)
+    state = normalize_filter_state(months, ('infeed', 'outfeed'), (), 'BOTH')
+    timer.run('report: all kpis and tables', rows, build_report, snapshot, state)
+
+    timer.run('tab: system health trends', rows, _trend_figures, missions)
+    timer.run('tab: mission charts', len(cells), _mission_figures, cells, kpis)
+    timer.run('tab: outlier view', rows, _outlier_view, missions, np.ones(rows, dtype=bool))
+    timer.run('tab: stock ageing', len(stock), _stock_figure, stock)
+    return timer.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help="multiple of the real export row counts")
+    parser.add_argument('--source-dir', default=".", help="directory with the real exports")
+    parser.add_argument('--data-dir', default=BENCH_DATA_DIR, help="where the synthetic exports are written")
+    parser.add_argument('--output', default="benchmark_results.json", help="results file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-generate', action='store_true', help="reuse exports already in --data-dir")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced run measuring peak memory")
+    args = parser.parse_args()
+
+    if not args.skip_generate:
+        print(f"Generating {args.scale:g}x exports in {args.data_dir}")
+        generate_exports(args.scale, args.source_dir, args.data_dir, args.seed)
+
+    stages = run_benchmark(args.data_dir, trace_memory=not args.no_memory)
+    results = {'scale': args.scale, 'seed': args.seed, 'stages': stages}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+        f.write('\n')
+
+    width = max(len(s['stage']) for s in stages)
+    for s in stages:
+        rate = f"{s['rows_per_second']:>12,}/s" if s['rows_per_second'] else ' ' * 14
+        peak = f"{s['peak_mib']:>9.1f} MiB" if s['peak_mib'] is not None else ''
+        print(f"{s['stage']:<{width}}  {s['seconds']:>8.3f}s {rate} {peak}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import numpy as np
+import plotly.graph_objects as go
+
+PLOT_CONFIG = {"displayModeBar": False}
+
+COLORS = {
+    'dark_blue': '#0173B2',      
+    'orange': '#DE8F05',        
+    'sky_blue': '#56B4E9',       
+    'blue_green': '#029E73',     
+    'yellow': '#ECE133',         
+    'vermillion': '#D55E00',     
+    'reddish_purple': '#CC78BC', 
+    'dark_grey': '#6B6B6B',      
+    
+    # Sidebar colors
+    'sidebar_navy': '#003B7A',
+    'sidebar_gold': '#FDB913',
+    'sidebar_dark': '#002A5C',
+    'sidebar_border': '#004B9B',
+    'sidebar_text': '#E0E7F0',
+}
+
+FONT_FAMILY = "Times New Roman, Times, serif"
+
+# Shared layout templates. Plain dicts rather than plotly templates, which
+# would be embedded in (and enlarge) every serialized figure.
+BASE_LAYOUT = dict(
+    margin=dict(l=20, r=20, t=20, b=20),
+    paper_bgcolor='white',
+    plot_bgcolor='white',
+    font=dict(family=FONT_FAMILY, size=12),
+)
+
+LAYOUTS = {
+    'pie': dict(BASE_LAYOUT, height=300, showlegend=False),
+    'bar': dict(
+        BASE_LAYOUT,
+        height=300,
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=True, gridcolor='#E0E0E0'),
+    ),
+    'line': dict(
+        BASE_LAYOUT,
+        height=300,
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=True, gridcolor='#E0E0E0'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+    ),
+    'downtime_trend': dict(
+        BASE_LAYOUT,
+        height=350,
+        margin=dict(l=20, r=20, t=40, b=60),
+        xaxis=dict(showgrid=False, title='Month', tickangle=-45),
+        yaxis=dict(
+            type='log',
+            showgrid=True,
+            gridcolor='#E0E0E0',
+            title='Downtime % (log scale)',
+            tickvals=[0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 25, 50, 100],
+            ticktext=["0.01%", "0.05%", "0.1%", "0.5%", "1%", "2%", "5%", "10%", "25%", "50%", "100%"]
+        ),
+        showlegend=False,
+        font=dict(family=FONT_FAMILY, size=11),
+    ),
+}
+
+
+def apply_layout(fig, template, **overrides):
+    """Apply a shared layout template, then any chart-specific overrides"""
+    fig.update_layout(LAYOUTS[template])
+    if overrides:
+        fig.update_layout(**overrides)
+    return fig
+
+
+def lollipop_figure(x, y, labels, base=0.01, template='downtime_trend', show_labels=True):
+    """Lollipop chart drawn with two traces whatever the number of points
+
+    All stems are one line trace whose segments are separated by gaps, and all
+    heads are one marker trace, so the payload grows with the data only.
+    Without show_labels the labels appear on hover only.
+    """
+    x = np.asarray(x, dtype=object)
+    y = np.asarray(y, dtype=float)
+    stem_x = np.empty(len(x) * 3, dtype=object)
+    stem_x[0::3] = x
+    stem_x[1::3] = x
+    stem_x[2::3] = None
+    stem_y = np.empty(len(y) * 3, dtype=float)
+    stem_y[0::3] = base
+    stem_y[1::3] = y
+    stem_y[2::3] = np.nan
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=stem_x,
+        y=stem_y,
+        mode='lines',
+        line=dict(color=COLORS['dark_grey'], width=2),
+        connectgaps=False,
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=x,
+        y=y,
+        mode='markers+text' if show_labels else 'markers',
+        marker=dict(
+            size=14 if show_labels else 6,
+            color=COLORS['vermillion'],
+            line=dict(color='white', width=2 if show_labels else 0)
+        ),
+        text=list(labels),
+        textposition='top center',
+        textfont=dict(size=10, color='#333'),
+        name='Downtime',
+        hovertemplate='%{x}<br>Downtime: %{text}<extra></extra>'
+    ))
+    return apply_layout(fig, template)
+
+
+def pie_figure(labels, values, colors, hole=0, template='pie', **trace_options):
+    """Pie or donut chart on a shared layout template"""
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        marker=dict(colors=colors),
+        hole=hole,
+        **{'textinfo': 'label+percent', **trace_options}
+    )])
+    return apply_layout(fig, template)
+
+
+def grouped_bar_figure(categories, series, colors):
+    """Grouped bar chart with one trace per named series"""
+    fig = go.Figure()
+    for (name, values), color in zip(series.items(), colors):
+        fig.add_trace(go.Bar(name=name, x=categories, y=values, marker_color=color))
+    return apply_layout(
+        fig, 'bar',
+        barmode='group',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+
+
+def line_figure(x, series, colors):
+    """Line chart with one trace per named series"""
+    fig = go.Figure()
+    for (name, values), color in zip(series.items(), colors):
+        fig.add_trace(go.Scatter(name=name, x=x, y=values, mode='lines', line=dict(color=color, width=2)))
+    return apply_layout(fig, 'line')
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from schema import MISSION_SCHEMA, concat_frames
+
+# Dimensions of the mission cube. outlier_reason refines is_outlier, so keeping
+# both adds no cells but lets the outlier reason chart read the cube as well.
+CUBE_DIMENSIONS = [
+    'month_key', 'mission_type', 'MISSION_STATUS', 'PRODUCT_NAME', 'AREA_ID', 'SHIFT_ID',
+    'is_outlier', 'outlier_reason',
+]
+
+# dtypes of the cube's dimension columns, as in the mission table
+CUBE_SCHEMA = {column: dtype for column, dtype in MISSION_SCHEMA.items() if column in CUBE_DIMENSIONS}
+
+# Measures and how cells combine when rolled up or merged
+CUBE_MEASURES = {
+    'count': 'sum', 'completed': 'sum', 'duration_sum': 'sum', 'duration_count': 'sum',
+    'duration_min': 'min', 'duration_max': 'max',
+}
+
+
+def build_cube(missions):
+    """Aggregate missions into one row per combination of CUBE_DIMENSIONS"""
+    duration = missions['duration_minutes']
+    cube = pd.DataFrame({
+        'count': np.ones(len(missions), dtype=np.int64),
+        'completed': (missions['MISSION_STATUS'] == 'COMPLETED').to_numpy(dtype=np.int64),
+        'duration_sum': duration.fillna(0).to_numpy(),
+        'duration_count': duration.notna().to_numpy(dtype=np.int64),
+        'duration_min': duration.to_numpy(),
+        'duration_max': duration.to_numpy(),
+    })
+    keys = [missions[dim] for dim in CUBE_DIMENSIONS]
+    cube = cube.groupby(keys, observed=True, dropna=False, sort=False).agg(CUBE_MEASURES)
+    return cube.reset_index()
+
+
+def merge_cubes(*cubes):
+    """Combine cubes built from disjoint sets of missions (e.g. an appended tail)"""
+    stacked = concat_frames(cubes, CUBE_SCHEMA)
+    merged = stacked.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=False).agg(CUBE_MEASURES)
+    return merged.reset_index()
+
+
+def slice_cube(cube, months=None, mission_types=None, statuses=None, outlier_option='BOTH'):
+    """Select the cube cells matching the sidebar filters"""
+    mask = np.ones(len(cube), dtype=bool)
+    if months:
+        mask &= cube['month_key'].isin(months).to_numpy()
+    if mission_types:
+        mask &= cube['mission_type'].isin(mission_types).to_numpy()
+    if statuses:
+        mask &= cube['MISSION_STATUS'].isin(statuses).to_numpy()
+    if outlier_option == 'Outlier Missions':
+        mask &= cube['is_outlier'].to_numpy()
+    elif outlier_option == 'Normal Missions':
+        mask &= ~cube['is_outlier'].to_numpy()
+    return cube[mask]
+
+
+def rollup(cells, by):
+    """Roll the cube measures up to the `by` dimension(s)"""
+    return cells.groupby(by, observed=False, sort=False).agg(CUBE_MEASURES)
+
+
+def cube_kpis(cells):
+    """Dashboard KPI values for a cube slice"""
+    by_type = rollup(cells, 'mission_type').reindex(cells['mission_type'].cat.categories, fill_value=0)
+
+    def uptime(mission_type):
+        total = by_type.at[mission_type, 'count']
+        return by_type.at[mission_type, 'completed'] / total * 100 if total > 0 else 0
+
+    total_missions = int(by_type['count'].sum())
+    completed_missions = int(by_type['completed'].sum())
+    duration_count = by_type['duration_count'].sum()
+    active = cells[cells['count'] > 0]
+    return {
+        'type_totals': by_type['count'].astype(int).to_dict(),
+        'type_completed': by_type['completed'].astype(int).to_dict(),
+        'infeed_uptime': uptime('infeed'),
+        'infeed_downtime': 100 - uptime('infeed'),
+        'outfeed_uptime': uptime('outfeed'),
+        'outfeed_downtime': 100 - uptime('outfeed'),
+        'total_missions': total_missions,
+        'completed_missions': completed_missions,
+        'completion_rate': completed_missions / total_missions * 100 if total_missions > 0 else 0,
+        'avg_duration': by_type['duration_sum'].sum() / duration_count if duration_count > 0 else 0,
+        'active_products': active['PRODUCT_NAME'].nunique(),
+        'areas_covered': active.loc[active['mission_type'] == 'transfer', 'AREA_ID'].nunique(),
+    }
+
+
+def product_type_matrix(cells, top_n=10, breakdown=None, other_label='Other'):
+    """Mission counts per product and mission type for a cube slice, busiest products first
+
+    Products outside the top_n by volume are summed into an `other_label` row.
+    With breakdown ('AREA_ID' or 'SHIFT_ID') the rows are (breakdown value,
+    product) pairs, the top products still being ranked on overall volume.
+    """
+    cells = cells[cells['PRODUCT_NAME'].notna() & (cells['PRODUCT_NAME'] != 'NA')]
+    by = ['PRODUCT_NAME'] if breakdown is None else [breakdown, 'PRODUCT_NAME']
+    types = cells['mission_type'].cat.categories
+    counts = (
+        cells.groupby(by + ['mission_type'], observed=True, sort=False)['count'].sum()
+        .unstack('mission_type', fill_value=0)
+        .reindex(columns=types, fill_value=0)
+    )
+    if counts.empty:
+        return counts
+
+    totals = counts.groupby(level='PRODUCT_NAME', observed=True).sum().sum(axis=1).sort_index()
+    ranked = list(totals.sort_values(ascending=False, kind='stable').index)
+    top = ranked[:top_n]
+    if len(ranked) > top_n:
+        counts = counts.rename(index=dict.fromkeys(ranked[top_n:], other_label), level='PRODUCT_NAME')
+        counts = counts.groupby(level=by, observed=True, sort=False).sum()
+        top.append(other_label)
+
+    order = {product: rank for rank, product in enumerate(top)}
+    keys = counts.index.to_frame(index=False)
+    keys['rank'] = keys['PRODUCT_NAME'].map(order)
+    positions = keys.sort_values(([breakdown] if breakdown else []) + ['rank'], kind='stable').index
+    return counts.iloc[positions]
@@ -0,0 +1,319 @@
+import json
+import os
+from collections import deque
+import threading
+import weakref
+from functools import reduce
+from operator import and_
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from cube import CUBE_SCHEMA, build_cube, merge_cubes
+from ingest import (
+    CACHE_DIR, CACHE_VERSION, CHUNK_BYTES, MISSION_TYPES, IncrementalLoader, _dump_json, _write_atomic,
+    build_missions, load_table, source_manifest, sync_tables,
+)
+from outliers import outlier_reasons, rules_hash
+from schema import MISSION_SCHEMA, apply_schema, concat_frames
+from sketches import SKETCH_SCHEMA, build_sketches, merge_sketches
+
+# Bump whenever the partition layout or file contents change
+DATASET_VERSION = 3
+DATASET_DIR = "missions"
+
+# Hive-style directories: year=2025/month=06/mission_type=infeed/part-<generation>-<first row>.parquet
+PARTITIONING = ds.partitioning(
+    pa.schema([('year', pa.int16()), ('month', pa.int8()), ('mission_type', pa.string())]), flavor='hive'
+)
+
+
+def partition_dir(key, mission_type):
+    """Directory, relative to the dataset root, of one month key's rows of one mission type
+
+    Key 0 holds the missions without a creation date.
+    """
+    return os.path.join(f"year={key // 100}", f"month={key % 100:02d}", f"mission_type={mission_type}")
+
+
+def _remove_files(root, names):
+    """Delete files of a superseded dataset version, and the partition directories left empty"""
+    for name in names:
+        try:
+            os.remove(os.path.join(root, name))
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(os.path.join(root, name))
+        while os.path.abspath(directory) != os.path.abspath(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+
+class DatasetVersion:
+    """One immutable version of the mission dataset: its part files, cube and latency sketches
+
+    files maps a mission type to its [month key, path] pairs, paths being
+    relative to root. Part files are never changed once written and every
+    version reads only the files it lists, so a version keeps returning the
+    same rows while newer versions are written, and reads take no lock.
+    Reads only open the files of the selected months and types and only the
+    requested columns; status and outlier filters are pushed down to the
+    Parquet scan.
+    """
+
+    def __init__(self, root, files=None, cube=None, sketches=None, aggregate_files=()):
+        self.root = root
+        self.files = files or {}
+        self.cube = cube
+        self.sketches = sketches
+        self.aggregate_files = tuple(aggregate_files)
+
+    def names(self):
+        """Every file of the version, relative to root"""
+        return {path for parts in self.files.values() for _, path in parts} | set(self.aggregate_files)
+
+    def _paths(self, months=(), mission_types=()):
+        months = set(months)
+        return sorted(
+            os.path.join(self.root, path)
+            for mission_type, parts in self.files.items() if not mission_types or mission_type in mission_types
+            for key, path in parts if not months or key in months
+        )
+
+    def month_keys(self):
+        """Month keys with at least one part file, oldest first (0 left out)"""
+        return sorted({key for parts in self.files.values() for key, _ in parts} - {0})
+
+    def read(self, months=(), mission_types=(), statuses=(), outlier_option='BOTH', columns=None,
+             outliers_only=False):
+        """Missions matching the filters, in mission table order, with only `columns` (plus mission_type)
+
+        Months and mission types select part files; statuses and the outlier
+        options are evaluated by the Parquet scan.
+        """
+        filters = []
+        if statuses:
+            filters.append(ds.field('MISSION_STATUS').isin(list(statuses)))
+        if outlier_option == 'Outlier Missions' or outliers_only:
+            filters.append(ds.field('is_outlier'))
+        if outlier_option == 'Normal Missions':
+            filters.append(~ds.field('is_outlier'))
+        if columns is not None:
+            columns = ['mission_type'] + [col for col in columns if col != 'mission_type']
+
+        paths = self._paths(months, mission_types)
+        if not paths:
+            # Nothing selected: scan no rows of one file for the column types
+            paths = self._paths()[:1]
+            filters.append(ds.scalar(False))
+        if not paths:
+            return pd.DataFrame(columns=columns or ['mission_type'])
+        dataset = ds.dataset(paths, format='parquet', partitioning=PARTITIONING, partition_base_dir=self.root,
+                             exclude_invalid_files=False)
+        table = dataset.to_table(columns=columns, filter=reduce(and_, filters) if filters else None)
+
+        missions = table.to_pandas()
+        missions = missions.drop(columns=[col for col in ('year', 'month') if col in missions.columns])
+        missions.insert(0, 'mission_type', pd.Categorical(missions.pop('mission_type'), categories=MISSION_TYPES))
+        if 'outlier_reason' in missions.columns:
+            missions['outlier_reason'] = missions['outlier_reason'].astype('category').cat.set_categories(
+                outlier_reasons()
+            )
+        # Same category sets and dtypes as the in-memory mission table
+        return concat_frames([missions], MISSION_SCHEMA)
+
+    def latest(self, column='created_datetime'):
+        """Largest value of a timestamp column, read from the newest month's part files only"""
+        months = self.month_keys()
+        if not months:
+            return None
+        dataset = ds.dataset(self._paths(months[-1:]), format='parquet', partitioning=PARTITIONING,
+                             partition_base_dir=self.root, exclude_invalid_files=False)
+        table = dataset.to_table(columns=[column])
+        return pd.Timestamp(pc.max(table.column(column)).as_py())
+
+    def size_bytes(self):
+        """Bytes of Parquet on disk"""
+        return sum(os.path.getsize(os.path.join(self.root, name)) for name in self.names())
+
+
+class MissionDataset:
+    """The mission table on disk, partitioned by creation month and mission type
+
+    current is the latest DatasetVersion. sync never changes or removes a
+    file a version lists: it writes new part files (tagged with a
+    generation number), a new cube and sketch file and then the manifest,
+    and only then replaces current in a single assignment. A file is
+    deleted by a later sync once every version listing it has been garbage
+    collected, i.e. once no snapshot reads from it any more. Only sync
+    takes the lock; there is one writer per dataset directory.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, "_dataset.json")
+        self._lock = threading.Lock()
+        # Live versions, and the files of collected ones awaiting deletion
+        self._versions = weakref.WeakSet()
+        self._retired = deque()
+        self.manifest = self._read_manifest()
+        self.current = self._track(self._read_version())
+        self._remove_unlisted()
+
+    def _track(self, version):
+        self._versions.add(version)
+        # Only queue the names: the finalizer may run inside garbage collection in any thread
+        weakref.finalize(version, self._retired.extend, sorted(version.names()))
+        return version
+
+    def _remove_retired(self):
+        """Delete the files of collected versions that no live version lists"""
+        names = set()
+        while self._retired:
+            names.add(self._retired.popleft())
+        if names:
+            live = set().union(*(version.names() for version in list(self._versions)))
+            _remove_files(self.root, sorted(names - live))
+
+    def _read_manifest(self):
+        empty = {'version': DATASET_VERSION, 'generation': 0, 'sources': {}, 'files': {}}
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return empty
+        if manifest.get('version') != DATASET_VERSION:
+            return empty
+        return manifest
+
+    def _read_version(self):
+        try:
+            cube = apply_schema(pd.read_parquet(os.path.join(self.root, self.manifest['cube'])), CUBE_SCHEMA)
+            sketches = apply_schema(pd.read_parquet(os.path.join(self.root, self.manifest['sketches'])), SKETCH_SCHEMA)
+        except (KeyError, OSError):
+            self.manifest.update(sources={}, files={})
+            return DatasetVersion(self.root)
+        return DatasetVersion(self.root, self.manifest['files'], cube, sketches,
+                              (self.manifest['cube'], self.manifest['sketches']))
+
+    def _remove_unlisted(self):
+        """Delete part and aggregate files no version lists (an interrupted sync, an older layout)"""
+        if not os.path.isdir(self.root):
+            return
+        listed = self.current.names() | {os.path.basename(self.manifest_path)}
+        stale = [
+            os.path.relpath(os.path.join(directory, name), self.root)
+            for directory, _, names in os.walk(self.root) for name in names
+        ]
+        _remove_files(self.root, [name for name in stale if name not in listed])
+
+    def _write_rows(self, mission_type, frame, offset, generation):
+        """Write a processed export's rows to their month partitions; returns the [month key, path] pairs"""
+        keys = frame['month_key'].to_numpy()
+        order = np.argsort(keys, kind='stable')
+        months, starts = np.unique(keys[order], return_index=True)
+        parts = []
+        for key, positions in zip(months, np.split(order, starts[1:])):
+            path = os.path.join(partition_dir(int(key), mission_type), f"part-{generation:06d}-{offset:012d}.parquet")
+            os.makedirs(os.path.join(self.root, os.path.dirname(path)), exist_ok=True)
+            rows = frame.iloc[positions]
+            _write_atomic(os.path.join(self.root, path), lambda p: rows.to_parquet(p, index=False))
+            parts.append([int(key), path])
+        return parts
+
+    def _type_aggregates(self, mission_type, frame):
+        """Cube and latency sketches of one mission type's rows"""
+        empty = frame.iloc[0:0]
+        missions = build_missions({t: frame if t == mission_type else empty for t in MISSION_TYPES})
+        return build_cube(missions), build_sketches(missions)
+
+    def sync(self, mission_type, status, frame, tail, source, load_frame):
+        """Bring one mission type's part files, cube and sketch cells in line with its source cache
+
+        status, frame and tail are what sync_table returned and source is the
+        source's cache manifest. Appended rows are written as new part files;
+        anything else that changed writes the type's rows again from
+        load_frame(), called only when frame is None. Part files written with
+        other outlier rules or another cache version are written again too,
+        as their outlier flags and reasons are stale.
+        """
+        with self._lock:
+            self._remove_retired()
+            previous = self.current
+            known = self.manifest['sources'].get(mission_type)
+            current = known is not None and previous.cube is not None and status != 'rebuilt' and (
+                known.get('version') == CACHE_VERSION and known.get('outlier_rules') == rules_hash()
+            )
+            if current and known['sha1'] == source['source']['sha1']:
+                return 'cached'
+            generation = self.manifest['generation'] + 1
+            files = dict(previous.files)
+            if current and status == 'appended' and known['rows'] == source['rows'] - len(tail):
+                files[mission_type] = files.get(mission_type, []) + self._write_rows(
+                    mission_type, tail, known['rows'], generation
+                )
+                cube, sketches = self._type_aggregates(mission_type, tail)
+                cube = merge_cubes(previous.cube, cube)
+                sketches = merge_sketches(previous.sketches, sketches)
+                result = 'appended'
+            else:
+                frame = frame if frame is not None else load_frame()
+                files[mission_type] = self._write_rows(mission_type, frame, 0, generation)
+                cube, sketches = self._type_aggregates(mission_type, frame)
+                if previous.cube is not None:
+                    cube = merge_cubes(previous.cube[previous.cube['mission_type'] != mission_type], cube)
+                    sketches = merge_sketches(
+                        previous.sketches[previous.sketches['mission_type'] != mission_type], sketches
+                    )
+                result = 'rebuilt'
+
+            aggregate_files = (f"_cube-{generation:06d}.parquet", f"_sketches-{generation:06d}.parquet")
+            _write_atomic(os.path.join(self.root, aggregate_files[0]), lambda p: cube.to_parquet(p, index=False))
+            _write_atomic(os.path.join(self.root, aggregate_files[1]), lambda p: sketches.to_parquet(p, index=False))
+            self.manifest['sources'][mission_type] = {
+                'sha1': source['source']['sha1'], 'rows': source['rows'],
+                'version': CACHE_VERSION, 'outlier_rules': rules_hash(),
+            }
+            self.manifest.update(generation=generation, files=files, cube=aggregate_files[0],
+                                 sketches=aggregate_files[1])
+            _write_atomic(self.manifest_path, lambda p: _dump_json(self.manifest, p))
+
+            self.current = self._track(DatasetVersion(self.root, files, cube, sketches, aggregate_files))
+            return result
+
+
+class DatasetLoader(IncrementalLoader):
+    """IncrementalLoader that keeps missions in a MissionDataset instead of in memory
+
+    Only the cube, the latency sketches and the stock snapshot are held;
+    tables() returns (None, stock, cube, sketches) and mission rows are read
+    through view, the DatasetVersion the cube and sketches belong to.
+    """
+
+    def __init__(self, data_dir=".", cache_dir=None, chunk_bytes=CHUNK_BYTES, dataset_dir=None):
+        super().__init__(data_dir, cache_dir, chunk_bytes)
+        self.cache_dir = cache_dir or os.path.join(data_dir, CACHE_DIR)
+        self.dataset = MissionDataset(dataset_dir or os.path.join(self.cache_dir, DATASET_DIR))
+        self.view = self.dataset.current
+
+    def refresh(self):
+        """Sync every export and its part files; returns the statuses reported by sync_table"""
+        with self._lock:
+            synced = sync_tables(self.data_dir, self.cache_dir, chunk_bytes=self.chunk_bytes, load=())
+            statuses = {}
+            for name, (frame, status, tail) in synced.items():
+                statuses[name] = status
+                self.dataset.sync(
+                    name, status, frame, tail, source_manifest(name, self.data_dir, self.cache_dir),
+                    lambda: load_table(name, self.data_dir, self.cache_dir)
+                )
+            self.view = self.dataset.current
+            self.cube, self.sketches = self.view.cube, self.view.sketches
+            statuses['stock'] = self._sync_stock()
+            return statuses
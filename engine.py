@@ -0,0 +1,320 @@
+"""Dashboard KPIs and chart data without Streamlit
+
+final.py is a view over these functions. The same results can be written
+for a filter set from the command line, e.g. for a nightly batch job:
+
+    python engine.py --months 2025-09 2025-10 --types infeed outfeed --output reports/2025-10
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ageing import AGE_BUCKET_EDGES, HIGH_AGEING_DAYS, high_ageing_bucket
+from cube import cube_kpis, product_type_matrix, rollup, slice_cube
+from dataset import DatasetLoader
+from filters import mission_mask, take_columns
+from ingest import MISSION_TYPES, IncrementalLoader, format_month_key, month_index
+from outliers import OUTLIER_TABLE_COLUMNS
+from result_cache import normalize_filter_state
+from sketches import latency_percentiles
+from throughput import THROUGHPUT_COLUMNS, rolling_throughput, utilization
+from timeseries import GRANULARITIES, aggregate
+
+MISSION_STATUSES = ('COMPLETED', 'ABORT')
+OUTLIER_OPTIONS = ('BOTH', 'Outlier Missions', 'Normal Missions')
+
+# Products shown individually in the product chart; the rest are grouped as 'Other'
+PRODUCT_TOP_N = 10
+
+# Optional breakdowns of the product chart
+PRODUCT_BREAKDOWNS = {'None': None, 'Area': 'AREA_ID', 'Shift': 'SHIFT_ID'}
+
+# Mission columns the trend aggregation reads
+TREND_COLUMNS = ['mission_type', 'MISSION_STATUS', 'created_datetime', 'SHIFT_ID', 'month_key']
+
+# Groupings of the area utilization table
+UTILIZATION_BREAKDOWNS = {'Area': ('AREA_ID',), 'Area and shift': ('AREA_ID', 'SHIFT_ID')}
+
+# Groupings of the wait and execution time percentiles
+LATENCY_BREAKDOWNS = {
+    'Mission type': ('mission_type',), 'Area': ('AREA_ID',), 'Product': ('PRODUCT_NAME',), 'Month': ('month_key',),
+}
+
+# Optional breakdowns of the stock ageing chart, and the values shown individually in them
+STOCK_BREAKDOWNS = {'None': None, 'Product': 'PRODUCT_NAME', 'Area': 'AREA_ID', 'Quality status': 'QUALITY_STATUS'}
+STOCK_BREAKDOWN_TOP_N = 6
+
+
+class Snapshot:
+    """One loaded version of the mission table, cube, latency sketches and stock snapshot
+
+    Mission rows are either held in memory (missions) or read on demand from
+    a version of the month-partitioned dataset, see mission_rows; the cube
+    and sketches are then that version's, so rows and aggregates always
+    match. stamp identifies the source files the tables were loaded from and
+    is what cached results are keyed on.
+    """
+
+    def __init__(self, missions, stock, cube, sketches, stamp=None, dataset=None):
+        self.missions = missions
+        self.dataset = dataset
+        self.stock = stock
+        self.cube = cube if dataset is None else dataset.cube
+        self.sketches = sketches if dataset is None else dataset.sketches
+        self.months = month_index(missions) if missions is not None else None
+        self.month_keys = sorted(self.months) if missions is not None else dataset.month_keys()
+        self.mission_count = int(self.cube['count'].sum())
+        self.stamp = stamp
+        # Creation time of the newest mission, NaT without missions
+        if missions is not None:
+            self.data_until = missions['created_datetime'].max()
+        else:
+            self.data_until = dataset.latest('created_datetime') or pd.NaT
+
+    def mission_rows(self, state=None, columns=None, outliers_only=False):
+        """Missions matching a normalized filter state (all of them for None)
+
+        A dataset read opens only the selected months' partitions and only
+        `columns`. In memory the selected rows and columns are copied, except
+        for an unfiltered read, which returns the whole table.
+        """
+        if self.missions is None:
+            return self.dataset.read(*(state or ()), columns=columns, outliers_only=outliers_only)
+        if state is None and not outliers_only:
+            return self.missions
+        mask = filter_mask(self, state) if state is not None else np.ones(len(self.missions), dtype=bool)
+        if outliers_only:
+            mask &= self.missions['is_outlier'].to_numpy()
+        return take_columns(self.missions, np.flatnonzero(mask), self.missions.columns if columns is None else columns)
+
+
+def load_snapshot(loader=None, data_dir=".", cache_dir=None, dataset=False):
+    """Load (or refresh) the tables through the Parquet cache as a Snapshot
+
+    With dataset=True missions stay on disk in the partitioned dataset.
+    """
+    loader = loader or (DatasetLoader if dataset else IncrementalLoader)(data_dir, cache_dir)
+    stamp = loader.source_stamp()
+    missions, stock, cube, sketches = loader.tables()
+    return Snapshot(missions, stock, cube, sketches, stamp, getattr(loader, 'view', None))
+
+
+# ========== FILTERS AND KPIS ==========
+
+def kpi_cells(snapshot, state):
+    """Cube cells matching a normalized filter state"""
+    return slice_cube(snapshot.cube, *state)
+
+
+def filter_mask(snapshot, state):
+    """Boolean mask of the in-memory missions matching a normalized filter state"""
+    return mission_mask(snapshot.missions, snapshot.months, *state)
+
+
+def mission_kpis(snapshot, state):
+    """Mission KPIs for a filter state, answered from the cube"""
+    return cube_kpis(kpi_cells(snapshot, state))
+
+
+def latency_table(snapshot, state, by=('mission_type',)):
+    """Wait and execution time percentiles per group for a filter state, merged from the latency sketches"""
+    return latency_percentiles(slice_cube(snapshot.sketches, *state), by)
+
+
+def stock_kpis(stock, area=None, product=None, edges=AGE_BUCKET_EDGES, high_ageing_days=HIGH_AGEING_DAYS):
+    """Pallet counts shown on the stock tab, answered from the stock snapshot's cells
+
+    High ageing counts the pallets in the ageing buckets past high_ageing_days.
+    """
+    cells = stock.select(area, product)
+    pallets = cells['pallets']
+    status = cells['PALLET_STATUS_NAME']
+    ageing = stock.ageing(edges, area=area, product=product)
+    return {
+        'total_pallets': int(pallets.sum()),
+        'full_pallets': int(pallets[status == 'FULL'].sum()),
+        'empty_pallets': int(pallets[status == 'EMPTY'].sum()),
+        'high_ageing': int(ageing.iloc[high_ageing_bucket(edges, high_ageing_days):].sum()),
+    }
+
+
+# ========== CHART DATA ==========
+
+def trend_series(snapshot, granularity):
+    """Completions, uptime and downtime per time bucket ('Hour' ... 'Month') and mission type"""
+    return aggregate(snapshot.mission_rows(columns=TREND_COLUMNS), GRANULARITIES[granularity])
+
+
+def status_counts(cells):
+    """Mission count per status for a cube slice, largest first"""
+    counts = rollup(cells, 'MISSION_STATUS')['count'].sort_values(ascending=False)
+    return counts[counts > 0]
+
+
+def product_counts(cells, top_n=PRODUCT_TOP_N, breakdown=None):
+    """Product by mission type counts for a cube slice, without empty rows"""
+    matrix = product_type_matrix(cells, top_n, breakdown)
+    return matrix[matrix.sum(axis=1) > 0]
+
+
+def outlier_rows(snapshot, state):
+    """Outlier table columns of the outlier missions matching a filter state"""
+    # Just the rows and columns the table needs; pages are sorted and formatted on demand
+    return snapshot.mission_rows(state, list(OUTLIER_TABLE_COLUMNS.values()), outliers_only=True)
+
+
+def outlier_reasons(outliers, total_missions):
+    """Outlier count per reason and its share of all missions (not just the filtered ones)"""
+    counts = outliers['outlier_reason'].value_counts()
+    counts = counts[counts > 0]
+    return pd.DataFrame({
+        'reason': counts.index,
+        'count': counts.values,
+        'percent': (counts / total_missions * 100).round(1).values,
+    })
+
+
+def throughput_rows(snapshot, state):
+    """Area, shift and start/end columns of the missions matching a filter state"""
+    return snapshot.mission_rows(state, THROUGHPUT_COLUMNS)
+
+
+def stock_ageing(stock, area=None, product=None, by=None, top_n=STOCK_BREAKDOWN_TOP_N, edges=AGE_BUCKET_EDGES):
+    """Pallet count per ageing bucket, or with `by` a bucket by value frame
+
+    Breakdown values beyond the top_n with the most pallets are summed as 'Other'.
+    """
+    ageing = stock.ageing(edges, by, area, product)
+    if by is None or ageing.shape[1] <= top_n:
+        return ageing
+    order = ageing.sum().sort_values(ascending=False, kind='stable').index
+    other = ageing[order[top_n:]].sum(axis=1).rename('Other')
+    return pd.concat([ageing[order[:top_n]], other], axis=1).rename_axis(columns=by)
+
+
+# ========== BATCH REPORT ==========
+
+def build_report(snapshot, state, granularity='Month', top_n=PRODUCT_TOP_N, breakdown=None, stock_breakdown=None,
+                 utilization_breakdown='Area', latency_breakdown='Mission type'):
+    """Every dashboard KPI and chart table for one filter state
+
+    Returns (summary, tables): summary is a JSON-ready dict, tables maps a
+    name to a DataFrame.
+    """
+    cells = kpi_cells(snapshot, state)
+    outliers = outlier_rows(snapshot, state)
+    months, mission_types, statuses, outlier_option = state
+    summary = {
+        'filters': {
+            'months': [format_month_key(key) for key in months],
+            'mission_types': list(mission_types),
+            'statuses': list(statuses),
+            'outliers': outlier_option,
+        },
+        'rows': {'missions': snapshot.mission_count, 'stock': len(snapshot.stock)},
+        'data_until': snapshot.data_until.isoformat() if pd.notna(snapshot.data_until) else None,
+        'missions': cube_kpis(cells),
+        'latency': latency_table(snapshot, state, ()).set_index('latency').to_dict(orient='index'),
+        'stock': stock_kpis(snapshot.stock),
+        'stock_as_of': snapshot.stock.reference.isoformat(),
+        'outliers': len(outliers),
+    }
+    products = product_counts(cells, top_n, breakdown)
+    products.columns = products.columns.astype(str)
+    ageing = stock_ageing(snapshot.stock, by=stock_breakdown)
+    if stock_breakdown is not None:
+        ageing.columns = ageing.columns.astype(str)
+        ageing = ageing.stack().rename('pallets')
+    rows = throughput_rows(snapshot, state)
+    rolling = rolling_throughput(rows)
+    rolling.columns = rolling.columns.astype(str)
+    tables = {
+        'trend': trend_series(snapshot, granularity),
+        'status': status_counts(cells).rename_axis('status').reset_index(),
+        'products': products.reset_index(),
+        'outlier_reasons': outlier_reasons(outliers, snapshot.mission_count),
+        'outliers': outliers.reset_index(drop=True),
+        'utilization': utilization(rows, UTILIZATION_BREAKDOWNS[utilization_breakdown]),
+        'throughput': rolling.reset_index(),
+        'latency': latency_table(snapshot, state, LATENCY_BREAKDOWNS[latency_breakdown]),
+        'stock_ageing': ageing.reset_index(),
+    }
+    return summary, tables
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def write_report(summary, tables, output_dir, fmt='json'):
+    """Write summary.json and one file per table in output_dir; returns the paths written"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, 'summary.json')]
+    with open(paths[0], 'w') as f:
+        json.dump(summary, f, indent=1, default=_json_value)
+        f.write('\n')
+    for name, table in tables.items():
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        if fmt == 'parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_json(path, orient='records', date_format='iso', indent=1)
+        paths.append(path)
+    return paths
+
+
+def parse_month(text):
+    """Month key of 'YYYY-MM' (or 'YYYYMM')"""
+    digits = text.replace('-', '')
+    if len(digits) != 6 or not digits.isdigit():
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {text!r}")
+    return int(digits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=".", help="directory with the exports")
+    parser.add_argument('--cache-dir', default=None, help="Parquet cache (default: <data-dir>/.cache)")
+    parser.add_argument('--dataset', action='store_true',
+                        help="read missions from the month-partitioned dataset instead of loading them all")
+    parser.add_argument('--months', nargs='*', type=parse_month, default=[], metavar='YYYY-MM')
+    parser.add_argument('--types', nargs='*', choices=MISSION_TYPES, default=[])
+    parser.add_argument('--statuses', nargs='*', choices=MISSION_STATUSES, default=[])
+    parser.add_argument('--outliers', choices=OUTLIER_OPTIONS, default='BOTH')
+    parser.add_argument('--granularity', choices=list(GRANULARITIES), default='Month')
+    parser.add_argument('--top-products', type=int, default=PRODUCT_TOP_N)
+    parser.add_argument('--breakdown', choices=list(PRODUCT_BREAKDOWNS), default='None')
+    parser.add_argument('--stock-breakdown', choices=list(STOCK_BREAKDOWNS), default='None')
+    parser.add_argument('--utilization-breakdown', choices=list(UTILIZATION_BREAKDOWNS), default='Area')
+    parser.add_argument('--latency-breakdown', choices=list(LATENCY_BREAKDOWNS), default='Mission type')
+    parser.add_argument('--as-of', type=pd.Timestamp, default=None, metavar='YYYY-MM-DD',
+                        help="date stock is aged against (default: now)")
+    parser.add_argument('--format', choices=('json', 'parquet'), default='json', help="format of the tables")
+    parser.add_argument('--output', default="report", help="output directory")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshot = load_snapshot(data_dir=args.data_dir, cache_dir=args.cache_dir, dataset=args.dataset)
+    if args.as_of is not None:
+        snapshot.stock = snapshot.stock.as_of(args.as_of)
+    loaded = time.perf_counter()
+    state = normalize_filter_state(args.months, args.types, args.statuses, args.outliers)
+    summary, tables = build_report(
+        snapshot, state, args.granularity, args.top_products, PRODUCT_BREAKDOWNS[args.breakdown],
+        STOCK_BREAKDOWNS[args.stock_breakdown], args.utilization_breakdown, args.latency_breakdown
+    )
+    paths = write_report(summary, tables, args.output, args.format)
+    print(f"Loaded {snapshot.mission_count:,} missions in {loaded - start:.2f}s, "
+          f"report built in {time.perf_counter() - loaded:.2f}s")
+    for path in paths:
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
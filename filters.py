@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def mission_mask(missions, index, months=(), mission_types=(), statuses=(), outlier_option='BOTH'):
+    """One boolean mask over the mission table for all sidebar selections
+
+    Each selection is evaluated on a single column and combined in place, so
+    no intermediate frame is materialized. index is the month_index of the
+    month-sorted mission table; months select whole row ranges from it.
+    """
+    if months:
+        mask = np.zeros(len(missions), dtype=bool)
+        for key in months:
+            if key in index:
+                start, stop = index[key]
+                mask[start:stop] = True
+    else:
+        mask = np.ones(len(missions), dtype=bool)
+    if mission_types:
+        mask &= missions['mission_type'].isin(mission_types).to_numpy()
+    if statuses:
+        mask &= missions['MISSION_STATUS'].isin(statuses).to_numpy()
+    if outlier_option == 'Outlier Missions':
+        mask &= missions['is_outlier'].to_numpy()
+    elif outlier_option == 'Normal Missions':
+        mask &= ~missions['is_outlier'].to_numpy()
+    return mask
+
+
+def take_columns(missions, positions, columns):
+    """Materialize only `columns` of the rows at `positions`, in one copy"""
+    return missions.iloc[positions, missions.columns.get_indexer(list(columns))]
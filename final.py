@@ -2,28 +2,38 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import functools
 from datetime import datetime, timedelta
-import numpy as np
-
-PLOT_CONFIG = {"displayModeBar": False}
-
-COLORS = {
-    'dark_blue': '#0173B2',      
-    'orange': '#DE8F05',        
-    'sky_blue': '#56B4E9',       
-    'blue_green': '#029E73',     
-    'yellow': '#ECE133',         
-    'vermillion': '#D55E00',     
-    'reddish_purple': '#CC78BC', 
-    'dark_grey': '#6B6B6B',      
-    
-    # Sidebar colors
-    'sidebar_navy': '#003B7A',
-    'sidebar_gold': '#FDB913',
-    'sidebar_dark': '#002A5C',
-    'sidebar_border': '#004B9B',
-    'sidebar_text': '#E0E7F0',
-}
+
+import engine
+from dataset import DatasetLoader
+from engine import (
+    LATENCY_BREAKDOWNS, MISSION_STATUSES, OUTLIER_OPTIONS, PRODUCT_BREAKDOWNS, PRODUCT_TOP_N, STOCK_BREAKDOWNS,
+    UTILIZATION_BREAKDOWNS,
+)
+from ingest import MISSION_TYPES, format_day, format_month_key
+from cube import CUBE_SCHEMA
+from charts import (
+    COLORS, PLOT_CONFIG, apply_layout, grouped_bar_figure, line_figure, lollipop_figure, pie_figure
+)
+from outliers import OUTLIER_TABLE_COLUMNS, describe_outlier_rules, outlier_page
+from profiling import RerunProfile
+from refresh import REFRESH_INTERVAL, SnapshotRefresher
+from result_cache import ResultCache, normalize_filter_state
+from schema import MISSION_SCHEMA, STOCK_SCHEMA, memory_report
+from sketches import LATENCY_PERCENTILES, SKETCH_ACCURACY, SKETCH_SCHEMA
+from throughput import MAX_MISSION_MINUTES, ROLLING_HOURS, rolling_throughput, throughput_hours, utilization
+from timeseries import GRANULARITIES
+
+# Rows per page of the outlier table
+OUTLIER_PAGE_SIZE = 50
+
+# Trend charts with more points than this show their value labels on hover only
+TREND_LABEL_LIMIT = 31
+
+# Dashboard sections; only the selected one is computed and drawn on a rerun
+TABS = ("System Health", "Missions", "Area Utilization", "Outlier Missions", "Stock Dashboard")
 
 st.set_page_config(
     page_title="ATS Mahindra Cell Dashboard",
@@ -32,6 +42,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Stage timings of every rerun are logged as one JSON line. Peak memory is
+# only measured when enabled in the Performance expander, since allocation
+# tracing slows reruns down noticeably.
+profile = RerunProfile(trace_memory=st.session_state.get('trace_memory', False))
+
 st.markdown("""
 <style>
     /* Global font family */
@@ -199,85 +214,61 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    try:
-        infeed = pd.read_csv("infeed_6.csv")
-        outfeed = pd.read_csv("outfeed_6.csv")
-        transfer = pd.read_csv("transfer_6.csv")
-        stock = pd.read_csv("stock.csv")
-        return infeed, outfeed, transfer, stock
-    except Exception as e:
-        st.error(f"Error loading data: {e}")
-        return None, None, None, None
-
-def calculate_duration(df, start_date_col, start_time_col, end_date_col, end_time_col):
-    """Calculate mission duration in minutes"""
-    df = df.copy()
-    try:
-        # Combine date and time columns
-        df['start_datetime'] = pd.to_datetime(
-            df[start_date_col].astype(str) + ' ' + df[start_time_col].astype(str),
-            format='%d-%m-%Y %H:%M:%S',
-            errors='coerce'
-        )
-        df['end_datetime'] = pd.to_datetime(
-            df[end_date_col].astype(str) + ' ' + df[end_time_col].astype(str),
-            format='%d-%m-%Y %H:%M:%S',
-            errors='coerce'
-        )
-        
-        # Calculate duration in minutes
-        df['duration_minutes'] = (df['end_datetime'] - df['start_datetime']).dt.total_seconds() / 60
-        
-    except Exception as e:
-        df['duration_minutes'] = np.nan
-    
-    return df
+@st.cache_resource
+def get_refresher():
+    """Process-wide refresher that rebuilds the snapshot in the background
 
-def classify_outlier_reason(duration):
-    """Classify the reason for outlier"""
-    if pd.isna(duration):
-        return None
-    elif duration < 0:
-        return 'Negative Duration'
-    elif duration > 3:
-        return 'More than 3 mins'
-    else:
-        return None
+    Missions are kept in the month-partitioned dataset on disk; the sessions
+    read just the partitions and columns of their filter selection. Sessions
+    only ever read the current snapshot and never wait for ingestion, except
+    for the first snapshot after a server start.
+    """
+    return SnapshotRefresher(DatasetLoader()).start()
 
-infeed_df, outfeed_df, transfer_df, stock_df = load_data()
+@st.cache_resource
+def get_result_cache():
+    """Process-wide cache of KPIs and figures keyed on the normalized filter state"""
+    return ResultCache(max_entries=128, max_bytes=64 * 1024 * 1024)
 
-if infeed_df is None:
+result_cache = get_result_cache()
+
+with profile.stage('load data'):
+    refresher = get_refresher()
+    snapshot = refresher.current()
+
+if snapshot is None:
+    st.error(f"Error loading data: {refresher.error}")
     st.stop()
 
-# Calculate durations for all dataframes
-infeed_df = calculate_duration(infeed_df, 'INFEED_MISSION_START_DATE', 'INFEED_MISSION_START_TIME', 
-                                'INFEED_MISSION_END_DATE', 'INFEED_MISSION_END_TIME')
-outfeed_df = calculate_duration(outfeed_df, 'OUTFEED_MISSION_START_DATE', 'OUTFEED_MISSION_START_TIME',
-                                 'OUTFEED_MISSION_END_DATE', 'OUTFEED_MISSION_END_TIME')
-transfer_df = calculate_duration(transfer_df, 'TRANSFER_MISSION_START_DATE', 'TRANSFER_MISSION_START_TIME',
-                                  'TRANSFER_MISSION_END_DATE', 'TRANSFER_MISSION_END_TIME')
-
-# Standardize mission status values to uppercase for consistent grouping
-infeed_df['INFEED_MISSION_STATUS'] = infeed_df['INFEED_MISSION_STATUS'].str.upper()
-outfeed_df['OUTFEED_MISSION_STATUS'] = outfeed_df['OUTFEED_MISSION_STATUS'].str.upper()
-transfer_df['TRANSFER_MISSION_STATUS'] = transfer_df['TRANSFER_MISSION_STATUS'].str.upper()
-
-# Add outlier reason classification
-infeed_df['outlier_reason'] = infeed_df['duration_minutes'].apply(classify_outlier_reason)
-outfeed_df['outlier_reason'] = outfeed_df['duration_minutes'].apply(classify_outlier_reason)
-transfer_df['outlier_reason'] = transfer_df['duration_minutes'].apply(classify_outlier_reason)
-
-stock_df = stock_df[
-    (stock_df['PRODUCT_NAME'].notna()) & 
-    (stock_df['PRODUCT_NAME'] != 'NA') &
-    (stock_df['PALLET_STATUS_NAME'].notna()) &
-    (stock_df['PALLET_STATUS_NAME'] != 'NA') &
-    (stock_df['PALLET_STATUS_NAME'].isin(['FULL', 'EMPTY']))
-].copy()
-
-stock_df['AGEING_DAYS'] = pd.to_numeric(stock_df['AGEING_DAYS'], errors='coerce').fillna(0)
+# Results are cached per source files and stock ageing time, both of which a
+# refresh can change
+data_snapshot = (snapshot.stamp, snapshot.stock.reference)
+
+
+def snapshot_memory():
+    """Memory report of the resident tables: the missions, or their cube and sketches when they stay on disk"""
+    if snapshot.missions is not None:
+        tables, schemas = {'missions': snapshot.missions}, {'missions': MISSION_SCHEMA}
+    else:
+        tables = {'mission cube': snapshot.cube, 'mission sketches': snapshot.sketches}
+        schemas = {'mission cube': CUBE_SCHEMA, 'mission sketches': SKETCH_SCHEMA}
+    return memory_report({**tables, 'stock': snapshot.stock.pallets}, {**schemas, 'stock': STOCK_SCHEMA})
+
+
+table_memory = result_cache.get_or_compute(data_snapshot, None, 'table_memory', snapshot_memory)
+
+if refresher.error is not None:
+    st.warning(f"Data refresh failed ({refresher.error}); showing data loaded {refresher.age() / 60:,.0f} min ago")
+
+
+@st.fragment(run_every=REFRESH_INTERVAL)
+def follow_refresher():
+    """Rerun the page once a newer snapshot was swapped in, so wall displays update on their own"""
+    if get_refresher().snapshot is not snapshot:
+        st.rerun()
+
+
+follow_refresher()
 
 st.sidebar.image("ats_logo.png", use_container_width=True)
 st.sidebar.markdown("<br>", unsafe_allow_html=True)
@@ -299,8 +290,9 @@ st.sidebar.markdown("""
 
 selected_months = st.sidebar.multiselect(
     "",
-    options=['2025-11', '2025-10', '2025-09', '2025-08', '2025-07', '2025-06', '2025-05'],
+    options=snapshot.month_keys[::-1],
     default=[],
+    format_func=format_month_key,
     key='months',
     label_visibility='collapsed'
 )
@@ -314,7 +306,7 @@ st.sidebar.markdown("""
 
 selected_mission_types = st.sidebar.multiselect(
     "",
-    options=['infeed', 'outfeed', 'transfer'],
+    options=list(MISSION_TYPES),
     default=[],
     key='mission_types',
     label_visibility='collapsed'
@@ -329,7 +321,7 @@ st.sidebar.markdown("""
 
 selected_statuses = st.sidebar.multiselect(
     "",
-    options=['COMPLETED', 'ABORT'],
+    options=list(MISSION_STATUSES),
     default=[],
     key='statuses',
     label_visibility='collapsed'
@@ -344,128 +336,277 @@ st.sidebar.markdown("""
 
 outlier_option = st.sidebar.radio(
     "",
-    options=['BOTH', 'Outlier Missions', 'Normal Missions'],
+    options=list(OUTLIER_OPTIONS),
     index=0,
     key='outlier_filter',
     label_visibility='collapsed',
-    help="Outliers: missions > 3 minutes or negative duration"
+    help=f"Outliers: missions with {describe_outlier_rules()}"
 )
 
-# Create filtered versions for KPIs
-infeed_filtered = infeed_df.copy()
-outfeed_filtered = outfeed_df.copy()
-transfer_filtered = transfer_df.copy()
-
-if selected_mission_types:
-    if 'infeed' not in selected_mission_types:
-        infeed_filtered = pd.DataFrame(columns=infeed_filtered.columns)
-    if 'outfeed' not in selected_mission_types:
-        outfeed_filtered = pd.DataFrame(columns=outfeed_filtered.columns)
-    if 'transfer' not in selected_mission_types:
-        transfer_filtered = pd.DataFrame(columns=transfer_filtered.columns)
-
-if selected_statuses:
-    infeed_filtered = infeed_filtered[infeed_filtered['INFEED_MISSION_STATUS'].isin(selected_statuses)]
-    outfeed_filtered = outfeed_filtered[outfeed_filtered['OUTFEED_MISSION_STATUS'].isin(selected_statuses)]
-    transfer_filtered = transfer_filtered[transfer_filtered['TRANSFER_MISSION_STATUS'].isin(selected_statuses)]
-
-if selected_months:
-    def filter_by_month(df, date_column):
-        if date_column not in df.columns:
-            return df
-        df_copy = df.copy()
-        df_copy['year_month'] = pd.to_datetime(df_copy[date_column], format='%d-%m-%Y', errors='coerce').dt.strftime('%Y-%m')
-        return df_copy[df_copy['year_month'].isin(selected_months)]
-    
-    infeed_filtered = filter_by_month(infeed_filtered, 'INFEED_MISSION_CDATE')
-    outfeed_filtered = filter_by_month(outfeed_filtered, 'OUTFEED_MISSION_CDATE')
-    transfer_filtered = filter_by_month(transfer_filtered, 'CDATE')
-
-# Apply outlier filter
-def apply_outlier_filter(df, option):
-    """
-    Apply outlier filter based on duration
-    Outliers: duration > 3 minutes OR duration < 0
-    """
-    if option == 'BOTH':
-        return df
-    elif option == 'Outlier Missions':
-        # Show ONLY outliers
-        return df[(df['duration_minutes'] > 3) | (df['duration_minutes'] < 0)]
-    elif option == 'Normal Missions':
-        # Show WITHOUT outliers
-        return df[(df['duration_minutes'] <= 3) & (df['duration_minutes'] >= 0)]
-    return df
-
-infeed_filtered = apply_outlier_filter(infeed_filtered, outlier_option)
-outfeed_filtered = apply_outlier_filter(outfeed_filtered, outlier_option)
-transfer_filtered = apply_outlier_filter(transfer_filtered, outlier_option)
-
-all_products = sorted(list(set(
-    list(infeed_df['PRODUCT_NAME'].dropna().unique()) +
-    list(outfeed_df['PRODUCT_NAME'].dropna().unique()) +
-    list(transfer_df['PRODUCT_NAME'].dropna().unique()) +
-    list(stock_df['PRODUCT_NAME'].dropna().unique())
-)))
-all_products = [p for p in all_products if p != 'NA']
+st.sidebar.markdown("""
+<p style="color: #E0E7F0; font-size: 12px; font-weight: 600; text-transform: uppercase; 
+          letter-spacing: 0.5px; margin-bottom: 8px; margin-top: 20px;">
+    Trend Granularity
+</p>
+""", unsafe_allow_html=True)
+
+trend_granularity = st.sidebar.selectbox(
+    "",
+    options=list(GRANULARITIES),
+    index=list(GRANULARITIES).index('Month'),
+    key='trend_granularity',
+    label_visibility='collapsed'
+)
+
+filter_state = normalize_filter_state(selected_months, selected_mission_types, selected_statuses, outlier_option)
 
 # ========== KPI CALCULATIONS (Using filtered data) ==========
 
-# Determine which data to use based on outlier filter
-if outlier_option == 'Outlier Missions':
-    # Use only outliers for KPI calculations
-    infeed_for_kpi = infeed_filtered[infeed_filtered['outlier_reason'].notna()].copy()
-    outfeed_for_kpi = outfeed_filtered[outfeed_filtered['outlier_reason'].notna()].copy()
-    transfer_for_kpi = transfer_filtered[transfer_filtered['outlier_reason'].notna()].copy()
-elif outlier_option == 'Normal Missions':
-    # Use only non-outliers
-    infeed_for_kpi = infeed_filtered[infeed_filtered['outlier_reason'].isna()].copy()
-    outfeed_for_kpi = outfeed_filtered[outfeed_filtered['outlier_reason'].isna()].copy()
-    transfer_for_kpi = transfer_filtered[transfer_filtered['outlier_reason'].isna()].copy()
-else:  # BOTH
-    # Use all data
-    infeed_for_kpi = infeed_filtered.copy()
-    outfeed_for_kpi = outfeed_filtered.copy()
-    transfer_for_kpi = transfer_filtered.copy()
-
-infeed_completed = len(infeed_for_kpi[infeed_for_kpi['INFEED_MISSION_STATUS'] == 'COMPLETED'])
-infeed_total = len(infeed_for_kpi)
-outfeed_completed = len(outfeed_for_kpi[outfeed_for_kpi['OUTFEED_MISSION_STATUS'] == 'COMPLETED'])
-outfeed_total = len(outfeed_for_kpi)
-
-infeed_uptime = (infeed_completed / infeed_total * 100) if infeed_total > 0 else 0
-infeed_downtime = 100 - infeed_uptime
-outfeed_uptime = (outfeed_completed / outfeed_total * 100) if outfeed_total > 0 else 0
-outfeed_downtime = 100 - outfeed_uptime
-
-total_missions = infeed_total + outfeed_total + len(transfer_for_kpi)
-completed_missions = (
-    infeed_completed + 
-    outfeed_completed + 
-    len(transfer_for_kpi[transfer_for_kpi['TRANSFER_MISSION_STATUS'] == 'COMPLETED'])
-)
-completion_rate = (completed_missions / total_missions * 100) if total_missions > 0 else 0
+# KPIs and the mission charts are answered from the pre-aggregated cube, which
+# applies the same month/type/status/outlier filters to a few hundred cells
+def filtered_kpis():
+    """Mission KPIs for the sidebar filters"""
+    with profile.stage('kpis'):
+        return result_cache.get_or_compute(
+            data_snapshot, filter_state, 'kpis', lambda: engine.mission_kpis(snapshot, filter_state)
+        )
 
-# Calculate actual average duration from KPI data
-all_durations = pd.concat([
-    infeed_for_kpi['duration_minutes'],
-    outfeed_for_kpi['duration_minutes'],
-    transfer_for_kpi['duration_minutes']
-]).dropna()
-avg_duration = all_durations.mean() if len(all_durations) > 0 else 0
 
-active_products = len(set(
-    list(infeed_for_kpi['PRODUCT_NAME'].dropna()) +
-    list(outfeed_for_kpi['PRODUCT_NAME'].dropna()) +
-    list(transfer_for_kpi['PRODUCT_NAME'].dropna())
-))
+def current_stock_kpis():
+    """Stock KPIs (not affected by the filters)"""
+    with profile.stage('stock kpis'):
+        return result_cache.get_or_compute(data_snapshot, None, 'stock_kpis', lambda: engine.stock_kpis(snapshot.stock))
 
-areas_covered = len(transfer_for_kpi['AREA_ID'].dropna().unique())
+# ========== FIGURE BUILDERS ==========
+# Each builder draws engine results as plotly figure JSON, so figures can be
+# kept in the shared result cache and reused by any session with the same
+# filter state.
 
-total_pallets = len(stock_df)
-full_pallets = len(stock_df[stock_df['PALLET_STATUS_NAME'] == 'FULL'])
-empty_pallets = len(stock_df[stock_df['PALLET_STATUS_NAME'] == 'EMPTY'])
-high_ageing = len(stock_df[stock_df['AGEING_DAYS'] < 30])
+def show_figure(fig_json, name):
+    profile.figure(name, fig_json)
+    st.plotly_chart(pio.from_json(fig_json), use_container_width=True, config=PLOT_CONFIG)
+
+
+def build_trend_figures(granularity):
+    """Infeed/outfeed downtime lollipops and throughput per time bucket (not affected by the filters)"""
+    series = engine.trend_series(snapshot, granularity)
+    series['downtime_log'] = series['downtime'].clip(lower=0.01)
+    
+    figures = {}
+    for mission_type in ('infeed', 'outfeed'):
+        type_series = series[series['mission_type'] == mission_type]
+        fig = lollipop_figure(
+            type_series['label'],
+            type_series['downtime_log'],
+            [f"{val:.2f}%" for val in type_series['downtime']],
+            base=0.01,
+            show_labels=len(type_series) <= TREND_LABEL_LIMIT
+        )
+        fig.update_xaxes(title=granularity)
+        figures[f'{mission_type}_trend'] = fig.to_json()
+    
+    # Completed missions per bucket, one line per mission type
+    throughput = series.pivot(index='label', columns='mission_type', values='completed')
+    throughput = throughput.reindex(series['label'].unique(), fill_value=0).fillna(0)
+    figures['throughput'] = line_figure(
+        throughput.index,
+        {t.capitalize(): throughput[t] for t in MISSION_TYPES if t in throughput},
+        [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']]
+    ).to_json()
+    return figures
+
+
+def build_mission_figures(state, kpis):
+    """Status pie and type donut for a filter state"""
+    status_counts = engine.status_counts(engine.kpi_cells(snapshot, state))
+    
+    fig_status = pie_figure(
+        status_counts.index,
+        status_counts.values,
+        [COLORS['blue_green'], COLORS['vermillion']]
+    )
+    
+    fig_types = pie_figure(
+        ['Infeed', 'Outfeed', 'Transfer'],
+        [kpis['type_totals'][t] for t in MISSION_TYPES],
+        [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']],
+        hole=0.5
+    )
+    
+    return {
+        'status': fig_status.to_json(),
+        'types': fig_types.to_json(),
+    }
+
+
+def build_product_figure(state, top_n, breakdown):
+    """Product by mission type bar chart for the busiest products, or None without data"""
+    product_df = engine.product_counts(engine.kpi_cells(snapshot, state), top_n, breakdown)
+    if len(product_df) == 0:
+        return None
+    
+    products = product_df.index.get_level_values('PRODUCT_NAME')
+    if breakdown is None:
+        categories = products
+    else:
+        label = 'Area' if breakdown == 'AREA_ID' else 'Shift'
+        categories = [[f"{label} {value}" for value in product_df.index.get_level_values(breakdown)], list(products)]
+    
+    return grouped_bar_figure(
+        categories,
+        {t.capitalize(): product_df[t] for t in MISSION_TYPES},
+        [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']]
+    ).to_json()
+
+
+def latency_group_labels(table, by):
+    """Axis label of each latency percentile group"""
+    if by == 'mission_type':
+        return [str(t).capitalize() for t in table[by]]
+    if by == 'AREA_ID':
+        return [f"Area {area}" for area in table[by]]
+    if by == 'month_key':
+        return [format_month_key(key) for key in table[by]]
+    return [str(value) for value in table[by]]
+
+
+def build_latency_view(state, breakdown):
+    """Wait and execution percentile charts and table for a filter state, or None without latencies"""
+    by = LATENCY_BREAKDOWNS[breakdown]
+    table = engine.latency_table(snapshot, state, by)
+    if table.empty:
+        return None
+    
+    percentile_colors = [COLORS['sky_blue'], COLORS['dark_blue'], COLORS['orange'], COLORS['vermillion']]
+    figures = {}
+    for latency in ('wait', 'execution'):
+        rows = table[table['latency'] == latency]
+        figures[latency] = grouped_bar_figure(
+            latency_group_labels(rows, by[0]),
+            {f"P{p}": rows[f'p{p}'].round(2) for p in LATENCY_PERCENTILES},
+            percentile_colors
+        ).to_json()
+    
+    display = table.copy()
+    display[by[0]] = latency_group_labels(table, by[0])
+    display['latency'] = display['latency'].astype(str).str.capitalize()
+    display = display.rename(columns={
+        by[0]: breakdown, 'latency': 'Latency', 'missions': 'Missions',
+        **{f'p{p}': f"P{p} (min)" for p in LATENCY_PERCENTILES},
+    }).round(2)
+    return {'wait': figures['wait'], 'execution': figures['execution'], 'table': display}
+
+
+# Points per area in the rolling throughput chart; longer ranges are thinned
+# and averaged over a correspondingly longer window
+THROUGHPUT_POINTS = 500
+
+# Utilization table columns and their headers
+UTILIZATION_TABLE_COLUMNS = {
+    'missions': 'Missions',
+    'busy_hours': 'Busy Hours',
+    'operating_hours': 'Operating Hours',
+    'utilization': 'Utilization %',
+    'missions_per_hour': 'Missions / Hour',
+    'peak_missions_per_hour': 'Peak Missions / Hour',
+    'avg_concurrent': 'Avg Concurrent',
+    'max_concurrent': 'Max Concurrent',
+}
+
+
+def build_utilization_view(state, breakdown):
+    """Per area (and shift) utilization table and chart, and rolling throughput per area"""
+    rows = engine.throughput_rows(snapshot, state)
+    table = utilization(rows, UTILIZATION_BREAKDOWNS[breakdown])
+    stride = max(1, -(-throughput_hours(rows) // THROUGHPUT_POINTS))
+    window = max(ROLLING_HOURS, stride)
+    rolling = rolling_throughput(rows, window=window).iloc[stride - 1::stride]
+    
+    labels = [f"Area {area}" for area in table['AREA_ID']]
+    if 'SHIFT_ID' in table:
+        labels = [[f"Shift {shift}" for shift in table['SHIFT_ID']], labels]
+    fig_utilization = grouped_bar_figure(labels, {'Utilization %': table['utilization'].round(1)}, [COLORS['dark_blue']])
+    palette = [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple'], COLORS['blue_green'], COLORS['vermillion']]
+    fig_throughput = line_figure(
+        rolling.index,
+        {f"Area {area}": rolling[area].round(2) for area in rolling.columns},
+        [palette[i % len(palette)] for i in range(len(rolling.columns))]
+    )
+    
+    display = table.rename(columns={'AREA_ID': 'Area', 'SHIFT_ID': 'Shift', **UTILIZATION_TABLE_COLUMNS}).round(2)
+    return {
+        'utilization': fig_utilization.to_json(),
+        'throughput': fig_throughput.to_json(),
+        'table': display,
+        'left_out': len(rows) - int(table['missions'].sum()),
+        'window': window,
+    }
+
+
+def build_outlier_view(state):
+    """Outlier reason pie and outlier table for a filter state, or None without outliers"""
+    # ALWAYS show outliers in this tab (don't check outlier_option)
+    # Get ALL outliers from unfiltered data (but respect other filters)
+    all_outliers = engine.outlier_rows(snapshot, state)
+    
+    if len(all_outliers) == 0:
+        return None
+    
+    # Percentages are relative to the UNFILTERED total
+    reasons = engine.outlier_reasons(all_outliers, snapshot.mission_count)
+    
+    # Create custom labels
+    custom_labels = [f"{label}<br>{pct}%" 
+                    for label, pct in zip(reasons['reason'], reasons['percent'])]
+    
+    fig_outlier_reasons = pie_figure(
+        custom_labels,
+        reasons['count'].values,
+        [COLORS['vermillion'], COLORS['orange'], COLORS['reddish_purple'],
+         COLORS['yellow'], COLORS['dark_grey']],
+        hole=0.4,
+        textposition='inside',
+        textinfo='label+value',
+        hovertemplate='%{label}<br>%{value} missions<extra></extra>',
+        showlegend=True
+    )
+    fig_outlier_reasons.update_layout(
+        height=400,
+        showlegend=True,
+        legend=dict(
+            orientation='h',
+            yanchor='bottom',
+            y=-0.2,
+            xanchor='center',
+            x=0.5,
+            title=None
+        )
+    )
+    
+    return {'reasons': fig_outlier_reasons.to_json(), 'outliers': all_outliers}
+
+
+def build_stock_figures(breakdown):
+    """Stock ageing distribution chart, optionally broken down (not affected by the filters)"""
+    age_counts = engine.stock_ageing(snapshot.stock, by=breakdown)
+    
+    if breakdown is None:
+        fig_ageing = go.Figure(data=[go.Bar(
+            x=age_counts.index,
+            y=age_counts.values,
+            marker_color=COLORS['sky_blue'],
+            width=0.4
+        )])
+        apply_layout(fig_ageing, 'bar')
+    else:
+        label = 'Area ' if breakdown == 'AREA_ID' else ''
+        fig_ageing = grouped_bar_figure(
+            age_counts.index,
+            {f"{label}{value}" if value != 'Other' else value: age_counts[value] for value in age_counts.columns},
+            [COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple'], COLORS['blue_green'],
+             COLORS['sky_blue'], COLORS['vermillion'], COLORS['dark_grey']]
+        )
+    return {'ageing': fig_ageing.to_json()}
 
 # ========== DASHBOARD TABS ==========
 
@@ -475,16 +616,22 @@ st.markdown("---")
 # Custom CSS for better tab styling (light theme friendly)
 st.markdown("""
 <style>
-    /* Tab container */
-    .stTabs [data-baseweb="tab-list"] {
+    /* Tab bar (the section selector radio) */
+    .st-key-active_tab [role="radiogroup"] {
         gap: 8px;
         background-color: transparent;
         padding: 10px 0px;
         border-bottom: 2px solid #E0E0E0;
+        margin-bottom: 30px;
+    }
+    
+    /* Hide the radio circles */
+    .st-key-active_tab label[data-baseweb="radio"] > div:first-child {
+        display: none;
     }
     
     /* Individual tabs */
-    .stTabs [data-baseweb="tab"] {
+    .st-key-active_tab label[data-baseweb="radio"] {
         height: 50px;
         white-space: pre-wrap;
         background-color: #F5F5F5;
@@ -503,7 +650,7 @@ st.markdown("""
     }
     
     /* Tab hover effect */
-    .stTabs [data-baseweb="tab"]:hover {
+    .st-key-active_tab label[data-baseweb="radio"]:hover {
         background-color: #FFFFFF;
         border-color: #FDB913;
         border-bottom: none;
@@ -512,7 +659,7 @@ st.markdown("""
     }
     
     /* Active/selected tab */
-    .stTabs [aria-selected="true"] {
+    .st-key-active_tab label[data-baseweb="radio"]:has(input:checked) {
         background: linear-gradient(135deg, #003B7A 0%, #0056A8 100%);
         border: 2px solid #FDB913;
         border-bottom: 4px solid #FDB913;
@@ -520,14 +667,12 @@ st.markdown("""
         box-shadow: 0 4px 12px rgba(0, 59, 122, 0.4);
     }
     
-    /* Tab panel */
-    .stTabs [data-baseweb="tab-panel"] {
-        padding-top: 30px;
-        background-color: white;
+    .st-key-active_tab label[data-baseweb="radio"]:has(input:checked) p {
+        color: #FFFFFF;
     }
     
     /* Make tab text more visible */
-    button[data-baseweb="tab"] > div > p {
+    .st-key-active_tab label[data-baseweb="radio"] p {
         font-size: 15px;
         font-weight: 600;
         letter-spacing: 0.5px;
@@ -566,17 +711,49 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ========== CREATE TABS ==========
-tab1, tab2, tab3, tab4 = st.tabs(["System Health", "Missions", "Outlier Missions", "Stock Dashboard"])
+# A radio instead of st.tabs, which would run and send every tab on each
+# rerun. Each tab is a fragment, so its own widgets rerun just that tab;
+# the sidebar filters rerun the script, i.e. the selected tab only.
+active_tab = st.radio("Section", TABS, horizontal=True, key='active_tab', label_visibility='collapsed')
+
+
+def tab_fragment(stage):
+    """Run a tab's body as a Streamlit fragment timed as `stage`
+
+    A fragment rerun skips the rest of the script, so it gets a profile and
+    log line of its own.
+    """
+    def decorator(body):
+        @st.fragment
+        @functools.wraps(body)
+        def run():
+            global profile
+            fragment_rerun = profile.logged
+            if fragment_rerun:
+                profile = RerunProfile(trace_memory=st.session_state.get('trace_memory', False))
+            with profile.stage(stage):
+                body()
+            if fragment_rerun:
+                profile.log(fragment=stage, cache=result_cache.stats())
+        return run
+    return decorator
 
 # ========== TAB 1: SYSTEM HEALTH ==========
-with tab1:
+@tab_fragment('tab: system health')
+def system_health_tab():
+    kpis = filtered_kpis()
+    infeed_uptime = kpis['infeed_uptime']
+    infeed_downtime = kpis['infeed_downtime']
+    outfeed_uptime = kpis['outfeed_uptime']
+    outfeed_downtime = kpis['outfeed_downtime']
+    
     st.subheader("System Health Overview")
     
     # Show indicator if outlier filter is active
     if outlier_option == 'Outlier Missions':
-        st.info("⚠️ Showing metrics for OUTLIERS only (missions >3 mins or negative duration)")
+        st.info(f"⚠️ Showing metrics for OUTLIERS only (missions with {describe_outlier_rules()})")
     elif outlier_option == 'Normal Missions':
-        st.success("✅ Showing metrics for NORMAL missions only (≤3 mins and ≥0)")
+        st.success("✅ Showing metrics for NORMAL missions only (no outlier rule matched)")
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -622,154 +799,44 @@ with tab1:
     
     st.markdown("<br><br>", unsafe_allow_html=True)
     
-    # Monthly Performance Trends
-    st.subheader("Monthly Performance Trends")
-    
-    # Prepare monthly data for infeed
-    infeed_df_copy = infeed_df.copy()
-    infeed_df_copy['month'] = pd.to_datetime(infeed_df_copy['INFEED_MISSION_CDATE'], format='%d-%m-%Y', errors='coerce').dt.strftime('%Y-%m')
-    
-    # Prepare monthly data for outfeed
-    outfeed_df_copy = outfeed_df.copy()
-    outfeed_df_copy['month'] = pd.to_datetime(outfeed_df_copy['OUTFEED_MISSION_CDATE'], format='%d-%m-%Y', errors='coerce').dt.strftime('%Y-%m')
-    
-    # Calculate monthly metrics for infeed
-    infeed_monthly = infeed_df_copy.groupby('month').agg(
-        total=('INFEED_MISSION_STATUS', 'count'),
-        completed=('INFEED_MISSION_STATUS', lambda x: (x == 'COMPLETED').sum())
-    ).reset_index()
-    infeed_monthly['uptime'] = (infeed_monthly['completed'] / infeed_monthly['total'] * 100).round(2)
-    infeed_monthly['downtime'] = (100 - infeed_monthly['uptime']).round(2)
-    infeed_monthly['downtime_log'] = infeed_monthly['downtime'].apply(lambda x: max(x, 0.01))
-    infeed_monthly = infeed_monthly.sort_values('month')
-    
-    # Calculate monthly metrics for outfeed
-    outfeed_monthly = outfeed_df_copy.groupby('month').agg(
-        total=('OUTFEED_MISSION_STATUS', 'count'),
-        completed=('OUTFEED_MISSION_STATUS', lambda x: (x == 'COMPLETED').sum())
-    ).reset_index()
-    outfeed_monthly['uptime'] = (outfeed_monthly['completed'] / outfeed_monthly['total'] * 100).round(2)
-    outfeed_monthly['downtime'] = (100 - outfeed_monthly['uptime']).round(2)
-    outfeed_monthly['downtime_log'] = outfeed_monthly['downtime'].apply(lambda x: max(x, 0.01))
-    outfeed_monthly = outfeed_monthly.sort_values('month')
+    # Performance Trends at the granularity chosen in the sidebar
+    st.subheader("Performance Trends")
+    
+    trend_figures = result_cache.get_or_compute(
+        data_snapshot, trend_granularity, 'trend_figures', lambda: build_trend_figures(trend_granularity)
+    )
     
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("**Infeed Downtime by Month**")
-        
-        fig_infeed_trend = go.Figure()
+        st.markdown(f"**Infeed Downtime by {trend_granularity}**")
         
-        # Add lollipop stems
-        min_val = 0.01
-        for idx, row in infeed_monthly.iterrows():
-            fig_infeed_trend.add_trace(go.Scatter(
-                x=[row['month'], row['month']],
-                y=[min_val, row['downtime_log']],
-                mode='lines',
-                line=dict(color=COLORS['dark_grey'], width=2),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-        
-        # Add lollipop heads
-        fig_infeed_trend.add_trace(go.Scatter(
-            x=infeed_monthly['month'],
-            y=infeed_monthly['downtime_log'],
-            mode='markers+text',
-            marker=dict(
-                size=14,
-                color=COLORS['vermillion'],
-                line=dict(color='white', width=2)
-            ),
-            text=[f"{val:.2f}%" for val in infeed_monthly['downtime']],
-            textposition='top center',
-            textfont=dict(size=10, color='#333'),
-            name='Downtime',
-            hovertemplate='%{x}<br>Downtime: %{text}<extra></extra>'
-        ))
-        
-        fig_infeed_trend.update_layout(
-        height=350,
-        margin=dict(l=20, r=20, t=40, b=60),
-        paper_bgcolor='white',
-        plot_bgcolor='white',
-        xaxis=dict(
-        showgrid=False,
-        title='Month',
-        tickangle=-45
-        ),
-        yaxis=dict(
-        type='log',
-        showgrid=True,
-        gridcolor='#E0E0E0',
-        title='Downtime % (log scale)',
-        tickvals=[0.01, 0.05, 0.1, 0.5, 1, 2],
-        ticktext=["0.01%", "0.05%", "0.1%", "0.5%", "1%", "2%"]
-        ),
-        showlegend=False,
-        font=dict(family="Times New Roman, Times, serif", size=11)
-        )
-
-        
-        st.plotly_chart(fig_infeed_trend, use_container_width=True, config=PLOT_CONFIG)
+        show_figure(trend_figures['infeed_trend'], 'infeed trend')
     with col2:
-        st.markdown("**Outfeed Downtime by Month**")
-        
-        fig_outfeed_trend = go.Figure()
-        
-        # Add lollipop stems
-        min_val = 0.01
-        for idx, row in outfeed_monthly.iterrows():
-            fig_outfeed_trend.add_trace(go.Scatter(
-                x=[row['month'], row['month']],
-                y=[min_val, row['downtime_log']],
-                mode='lines',
-                line=dict(color=COLORS['dark_grey'], width=2),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-        
-        # Add lollipop heads
-        fig_outfeed_trend.add_trace(go.Scatter(
-            x=outfeed_monthly['month'],
-            y=outfeed_monthly['downtime_log'],
-            mode='markers+text',
-            marker=dict(
-                size=14,
-                color=COLORS['vermillion'],
-                line=dict(color='white', width=2)
-            ),
-            text=[f"{val:.2f}%" for val in outfeed_monthly['downtime']],
-            textposition='top center',
-            textfont=dict(size=10, color='#333'),
-            name='Downtime',
-            hovertemplate='%{x}<br>Downtime: %{text}<extra></extra>'
-        ))
+        st.markdown(f"**Outfeed Downtime by {trend_granularity}**")
         
-        fig_outfeed_trend.update_layout(
-            height=350,
-            margin=dict(l=20, r=20, t=40, b=60),
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            xaxis=dict(showgrid=False, title='Month', tickangle=-45),
-            yaxis=dict(type='log', showgrid=True, gridcolor='#E0E0E0', 
-                      title='Downtime % (Log Scale)', tickformat='.2f'),
-            showlegend=False,
-            font=dict(family="Times New Roman, Times, serif", size=11)
-        )
-        
-        st.plotly_chart(fig_outfeed_trend, use_container_width=True, config=PLOT_CONFIG)
+        show_figure(trend_figures['outfeed_trend'], 'outfeed trend')
+    
+    st.markdown(f"**Completed Missions by {trend_granularity}**")
+    show_figure(trend_figures['throughput'], 'throughput')
+
 
 # ========== TAB 2: MISSIONS ==========
-with tab2:
+@tab_fragment('tab: missions')
+def missions_tab():
+    kpis = filtered_kpis()
+    total_missions = kpis['total_missions']
+    completion_rate = kpis['completion_rate']
+    avg_duration = kpis['avg_duration']
+    active_products = kpis['active_products']
+    
     st.subheader("Mission Performance")
     
     # Show indicator if outlier filter is active
     if outlier_option == 'Outlier Missions':
-        st.info("⚠️ Showing metrics for OUTLIERS only (missions >3 mins or negative duration)")
+        st.info(f"⚠️ Showing metrics for OUTLIERS only (missions with {describe_outlier_rules()})")
     elif outlier_option == 'Normal Missions':
-        st.success("✅ Showing metrics for NORMAL missions only (≤3 mins and ≥0)")
+        st.success("✅ Showing metrics for NORMAL missions only (no outlier rule matched)")
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -814,204 +881,142 @@ with tab2:
     # Mission Charts - use KPI data which respects outlier filter
     st.subheader("Mission Status Overview")
     
-    all_missions_for_charts = pd.concat([
-        infeed_for_kpi[['INFEED_MISSION_STATUS']].rename(columns={'INFEED_MISSION_STATUS': 'STATUS'}),
-        outfeed_for_kpi[['OUTFEED_MISSION_STATUS']].rename(columns={'OUTFEED_MISSION_STATUS': 'STATUS'}),
-        transfer_for_kpi[['TRANSFER_MISSION_STATUS']].rename(columns={'TRANSFER_MISSION_STATUS': 'STATUS'})
-    ])
-    
-    status_counts = all_missions_for_charts['STATUS'].value_counts()
+    mission_figures = result_cache.get_or_compute(
+        data_snapshot, filter_state, 'mission_figures', lambda: build_mission_figures(filter_state, kpis)
+    )
     
     col1, col2, col3 = st.columns([1, 1, 2])
     
     with col1:
         st.markdown("**i. Mission Status Distribution**")
-        fig_status = go.Figure(data=[go.Pie(
-            labels=status_counts.index,
-            values=status_counts.values,
-            marker=dict(colors=[COLORS['blue_green'], COLORS['vermillion']]),
-            hole=0,
-            textinfo='label+percent'
-        )])
-        fig_status.update_layout(
-            height=300,
-            margin=dict(l=20, r=20, t=20, b=20),
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            showlegend=False,
-            font=dict(family="Times New Roman, Times, serif", size=12)
-        )
-        st.plotly_chart(fig_status, use_container_width=True, config=PLOT_CONFIG)
+        show_figure(mission_figures['status'], 'mission status')
     
     with col2:
         st.markdown("**ii. Mission Type Distribution**")
-        mission_types = pd.DataFrame({
-            'Type': ['Infeed', 'Outfeed', 'Transfer'],
-            'Count': [len(infeed_for_kpi), len(outfeed_for_kpi), len(transfer_for_kpi)]
-        })
-        fig_types = go.Figure(data=[go.Pie(
-            labels=mission_types['Type'],
-            values=mission_types['Count'],
-            marker=dict(colors=[COLORS['dark_blue'], COLORS['orange'], COLORS['reddish_purple']]),
-            hole=0.5,
-            textinfo='label+percent'
-        )])
-        fig_types.update_layout(
-            height=300,
-            margin=dict(l=20, r=20, t=20, b=20),
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            showlegend=False,
-            font=dict(family="Times New Roman, Times, serif", size=12)
-        )
-        st.plotly_chart(fig_types, use_container_width=True, config=PLOT_CONFIG)
+        show_figure(mission_figures['types'], 'mission types')
     
     with col3:
         st.markdown("**iii. Mission Count by Product and Type**")
         
-        product_type_data = []
-        for product in all_products[:10]:
-            infeed_count = len(infeed_for_kpi[infeed_for_kpi['PRODUCT_NAME'] == product])
-            outfeed_count = len(outfeed_for_kpi[outfeed_for_kpi['PRODUCT_NAME'] == product])
-            transfer_count = len(transfer_for_kpi[transfer_for_kpi['PRODUCT_NAME'] == product])
-            if infeed_count + outfeed_count + transfer_count > 0:
-                product_type_data.append({
-                    'Product': product,
-                    'Infeed': infeed_count,
-                    'Outfeed': outfeed_count,
-                    'Transfer': transfer_count
-                })
+        top_col, breakdown_col = st.columns(2)
+        with top_col:
+            product_top_n = st.number_input("Top products", min_value=1, max_value=50, value=PRODUCT_TOP_N,
+                                            step=1, key='product_top_n')
+        with breakdown_col:
+            product_breakdown = PRODUCT_BREAKDOWNS[
+                st.selectbox("Breakdown", list(PRODUCT_BREAKDOWNS), key='product_breakdown')
+            ]
         
-        product_df = pd.DataFrame(product_type_data)
+        product_figure = result_cache.get_or_compute(
+            data_snapshot, (filter_state, product_top_n, product_breakdown), 'product_figure',
+            lambda: build_product_figure(filter_state, product_top_n, product_breakdown)
+        )
         
-        if len(product_df) > 0:
-            fig_product_type = go.Figure()
-            fig_product_type.add_trace(go.Bar(name='Infeed', x=product_df['Product'], y=product_df['Infeed'], 
-                                             marker_color=COLORS['dark_blue']))
-            fig_product_type.add_trace(go.Bar(name='Outfeed', x=product_df['Product'], y=product_df['Outfeed'], 
-                                             marker_color=COLORS['orange']))
-            fig_product_type.add_trace(go.Bar(name='Transfer', x=product_df['Product'], y=product_df['Transfer'], 
-                                             marker_color=COLORS['reddish_purple']))
-            
-            fig_product_type.update_layout(
-                barmode='group',
-                height=300,
-                margin=dict(l=20, r=20, t=20, b=20),
-                paper_bgcolor='white',
-                plot_bgcolor='white',
-                xaxis=dict(showgrid=False),
-                yaxis=dict(showgrid=True, gridcolor='#E0E0E0'),
-                legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-                font=dict(family="Times New Roman, Times, serif", size=12)
-            )
-            st.plotly_chart(fig_product_type, use_container_width=True, config=PLOT_CONFIG)
+        if product_figure is not None:
+            show_figure(product_figure, 'products')
         else:
             st.info("No data available for this filter")
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.subheader("Wait and Execution Time")
+    
+    latency_breakdown = st.selectbox("Breakdown", list(LATENCY_BREAKDOWNS), key='latency_breakdown')
+    latency_view = result_cache.get_or_compute(
+        data_snapshot, (filter_state, latency_breakdown), 'latency_view',
+        lambda: build_latency_view(filter_state, latency_breakdown)
+    )
+    
+    if latency_view is None:
+        st.info("No missions with timestamps for this filter")
+        return
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Queue Wait (created to started), minutes**")
+        show_figure(latency_view['wait'], 'wait percentiles')
+    
+    with col2:
+        st.markdown("**Execution (started to ended), minutes**")
+        show_figure(latency_view['execution'], 'execution percentiles')
+    
+    st.dataframe(latency_view['table'], use_container_width=True, hide_index=True)
+    st.caption(f"Percentiles are merged from per-cell latency sketches and are within {SKETCH_ACCURACY:.0%} "
+               f"of the exact value. Negative latencies come from inconsistent timestamps.")
 
-# ========== TAB 3: OUTLIER ANALYSIS ==========
-with tab3:
-    st.subheader("Outlier Distribution Analysis")
+
+# ========== TAB 3: AREA UTILIZATION ==========
+@tab_fragment('tab: utilization')
+def utilization_tab():
+    st.subheader("Area Utilization")
     
-    # ALWAYS show outliers in this tab (don't check outlier_option)
-    # Get ALL outliers from unfiltered data (but respect other filters)
-    all_outliers_infeed = infeed_filtered[infeed_filtered['outlier_reason'].notna()].copy()
-    all_outliers_outfeed = outfeed_filtered[outfeed_filtered['outlier_reason'].notna()].copy()
-    all_outliers_transfer = transfer_filtered[transfer_filtered['outlier_reason'].notna()].copy()
+    # Show indicator if outlier filter is active
+    if outlier_option == 'Outlier Missions':
+        st.info(f"⚠️ Showing metrics for OUTLIERS only (missions with {describe_outlier_rules()})")
+    elif outlier_option == 'Normal Missions':
+        st.success("✅ Showing metrics for NORMAL missions only (no outlier rule matched)")
     
-    # ALWAYS use UNFILTERED total for percentage calculation
-    total_all_missions_unfiltered = len(infeed_df) + len(outfeed_df) + len(transfer_df)
+    utilization_breakdown = st.selectbox("Breakdown", list(UTILIZATION_BREAKDOWNS), key='utilization_breakdown')
+    view = result_cache.get_or_compute(
+        data_snapshot, (filter_state, utilization_breakdown), 'utilization_view',
+        lambda: build_utilization_view(filter_state, utilization_breakdown)
+    )
+    
+    if view['table'].empty:
+        st.info("No missions with start and end times for this filter")
+        return
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        st.markdown("**Utilization (busy share of operating hours)**")
+        show_figure(view['utilization'], 'utilization')
+    
+    with col2:
+        st.markdown(f"**Missions per Hour ({view['window']}h rolling)**")
+        show_figure(view['throughput'], 'throughput per area')
+    
+    st.dataframe(view['table'], use_container_width=True, hide_index=True)
+    st.caption(f"Busy time counts missions with a start and end time lasting at most {MAX_MISSION_MINUTES} mins "
+               f"({view['left_out']:,} left out). Operating hours are the clock hours in which an area "
+               f"(and shift) started a mission.")
+
+# ========== TAB 4: OUTLIER ANALYSIS ==========
+@tab_fragment('tab: outliers')
+def outliers_tab():
+    st.subheader("Outlier Distribution Analysis")
     
-    # Combine all outlier reasons
-    all_outlier_reasons = pd.concat([
-        all_outliers_infeed['outlier_reason'],
-        all_outliers_outfeed['outlier_reason'],
-        all_outliers_transfer['outlier_reason']
-    ]).dropna()
+    outlier_view = result_cache.get_or_compute(
+        data_snapshot, filter_state, 'outlier_view', lambda: build_outlier_view(filter_state)
+    )
     
-    if len(all_outlier_reasons) > 0:
+    if outlier_view is not None:
         col1, col2 = st.columns([1, 2])
         
         with col1:
             st.markdown("**Outlier Reason Distribution**")
             
-            reason_counts = all_outlier_reasons.value_counts()
-            
-            # Calculate percentages relative to UNFILTERED total
-            reason_percentages = (reason_counts / total_all_missions_unfiltered * 100).round(1)
-            
-            # Create custom labels
-            custom_labels = [f"{label}<br>{pct}%" 
-                            for label, pct in zip(reason_counts.index, reason_percentages.values)]
-            
-            fig_outlier_reasons = go.Figure(data=[go.Pie(
-                labels=custom_labels,
-                values=reason_counts.values,
-                marker=dict(colors=[COLORS['vermillion'], COLORS['orange']]),
-                hole=0.4,
-                textposition='inside',
-                textinfo='label+value',
-                hovertemplate='%{label}<br>%{value} missions<extra></extra>',
-                showlegend=True
-            )])
-            
-            fig_outlier_reasons.update_layout(
-                height=400,
-                margin=dict(l=20, r=20, t=20, b=20),
-                paper_bgcolor='white',
-                plot_bgcolor='white',
-                legend=dict(
-                    orientation='h',
-                    yanchor='bottom',
-                    y=-0.2,
-                    xanchor='center',
-                    x=0.5,
-                    title=None
-                ),
-                font=dict(family="Times New Roman, Times, serif", size=12)
-            )
-            
-            st.plotly_chart(fig_outlier_reasons, use_container_width=True, config=PLOT_CONFIG)
+            show_figure(outlier_view['reasons'], 'outlier reasons')
         
         with col2:
             st.markdown("**All Outliers**")
             
-            # Combine all outliers into one table
-            outlier_table_data = []
-            
-            for idx, row in all_outliers_infeed.iterrows():
-                outlier_table_data.append({
-                    'Type': 'Infeed',
-                    'Product': row['PRODUCT_NAME'],
-                    'Status': row['INFEED_MISSION_STATUS'],
-                    'Duration (min)': round(row['duration_minutes'], 2),
-                    'Reason': row['outlier_reason'],
-                    'Date': row['INFEED_MISSION_CDATE']
-                })
-            
-            for idx, row in all_outliers_outfeed.iterrows():
-                outlier_table_data.append({
-                    'Type': 'Outfeed',
-                    'Product': row['PRODUCT_NAME'],
-                    'Status': row['OUTFEED_MISSION_STATUS'],
-                    'Duration (min)': round(row['duration_minutes'], 2),
-                    'Reason': row['outlier_reason'],
-                    'Date': row['OUTFEED_MISSION_CDATE']
-                })
-            
-            for idx, row in all_outliers_transfer.iterrows():
-                outlier_table_data.append({
-                    'Type': 'Transfer',
-                    'Product': row['PRODUCT_NAME'],
-                    'Status': row['TRANSFER_MISSION_STATUS'],
-                    'Duration (min)': round(row['duration_minutes'], 2),
-                    'Reason': row['outlier_reason'],
-                    'Date': row['CDATE']
-                })
+            outlier_rows = outlier_view['outliers']
+            page_count = max(1, -(-len(outlier_rows) // OUTLIER_PAGE_SIZE))
             
-            outlier_df = pd.DataFrame(outlier_table_data)
+            sort_col, order_col, page_col = st.columns([2, 1, 1])
+            with sort_col:
+                sort_by = st.selectbox("Sort by", list(OUTLIER_TABLE_COLUMNS), index=3, key='outlier_sort')
+            with order_col:
+                descending = st.toggle("Descending", value=True, key='outlier_desc')
+            with page_col:
+                page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1,
+                                       key='outlier_page')
             
-            # Sort by duration (highest first)
-            outlier_df = outlier_df.sort_values('Duration (min)', ascending=False)
+            # Only the visible page is ordered, formatted and sent to the browser
+            outlier_df, total_outliers = outlier_page(
+                outlier_rows, sort_by, descending, min(page, page_count) - 1, OUTLIER_PAGE_SIZE
+            )
             
             st.dataframe(
                 outlier_df,
@@ -1020,12 +1025,20 @@ with tab3:
                 hide_index=True
             )
             
-            st.caption(f"Total outliers: {len(outlier_df):,}")
+            st.caption(f"Total outliers: {total_outliers:,}")
     else:
         st.info("No outliers found in the selected data")
 
-# ========== TAB 4: STOCK DASHBOARD ==========
-with tab4:
+
+# ========== TAB 5: STOCK DASHBOARD ==========
+@tab_fragment('tab: stock')
+def stock_tab():
+    stock_kpis = current_stock_kpis()
+    total_pallets = stock_kpis['total_pallets']
+    full_pallets = stock_kpis['full_pallets']
+    empty_pallets = stock_kpis['empty_pallets']
+    high_ageing = stock_kpis['high_ageing']
+    
     st.subheader("Stock Analysis")
     
     col1, col2, col3, col4 = st.columns(4)
@@ -1070,37 +1083,49 @@ with tab4:
     
     # Stock Ageing Chart
     st.subheader("Stock Ageing Distribution")
+    st.caption(f"Pallet ages as of {snapshot.stock.reference:%d %b %Y %H:%M}, counted from each pallet's load date")
     
-    def get_age_range(age):
-        if age <= 7:
-            return '0-7 days'
-        elif age <= 15:
-            return '8-15 days'
-        elif age <= 30:
-            return '16-30 days'
-        else:
-            return '30+ days'
-    
-    stock_df['AGE_RANGE'] = stock_df['AGEING_DAYS'].apply(get_age_range)
-    age_counts = stock_df['AGE_RANGE'].value_counts().reindex(['0-7 days', '8-15 days', '30+ days'], fill_value=0)
-    
-    fig_ageing = go.Figure(data=[go.Bar(
-        x=age_counts.index,
-        y=age_counts.values,
-        marker_color=COLORS['sky_blue'],
-        width=0.4
-    )])
-    fig_ageing.update_layout(
-        height=300,
-        margin=dict(l=20, r=20, t=20, b=20),
-        paper_bgcolor='white',
-        plot_bgcolor='white',
-        xaxis=dict(showgrid=False),
-        yaxis=dict(showgrid=True, gridcolor='#E0E0E0'),
-        font=dict(family="Times New Roman, Times, serif", size=12)
+    stock_breakdown = STOCK_BREAKDOWNS[st.selectbox("Breakdown", list(STOCK_BREAKDOWNS), key='stock_breakdown')]
+    stock_figures = result_cache.get_or_compute(
+        data_snapshot, stock_breakdown, 'stock_figures', lambda: build_stock_figures(stock_breakdown)
     )
-    st.plotly_chart(fig_ageing, use_container_width=True, config=PLOT_CONFIG)
+    show_figure(stock_figures['ageing'], 'stock ageing')
+
+
+TAB_VIEWS = {
+    "System Health": system_health_tab,
+    "Missions": missions_tab,
+    "Area Utilization": utilization_tab,
+    "Outlier Missions": outliers_tab,
+    "Stock Dashboard": stock_tab,
+}
+TAB_VIEWS[active_tab]()
+
+with st.sidebar.expander("Performance", expanded=False):
+    cache_stats = result_cache.stats()
+    st.caption(f"Result cache hits: {cache_stats['hits']:,} · Misses: {cache_stats['misses']:,} · "
+               f"Entries: {cache_stats['entries']} · {cache_stats['bytes'] / 1024:,.0f} KiB")
+    st.caption(f"Snapshot built {refresher.age() / 60:,.1f} min ago · {refresher.refreshes:,} refreshes · "
+               f"checked every {refresher.interval:,}s, rebuilt at least every {refresher.ttl / 60:,.0f} min")
+    st.caption(f"Mission dataset: {snapshot.mission_count:,} rows, "
+               f"{snapshot.dataset.size_bytes() / 2**20:,.1f} MiB on disk, read per filter selection")
+    for table in table_memory.itertuples():
+        st.caption(f"{table.table.capitalize()} table: {table.schema_bytes / 2**20:,.1f} MiB "
+                   f"({table.default_bytes / 2**20:,.1f} MiB with default dtypes, {table.saved:.0%} saved)")
+    st.toggle("Track peak memory", key='trace_memory',
+              help="Trace allocations with tracemalloc (process-wide) and report the peak of each rerun")
+    if st.toggle("Show rerun profile", key='show_profile'):
+        rerun = profile.summary()
+        st.caption(f"Rerun so far: {rerun['total_ms']:,.0f} ms"
+                   + (f" · Peak memory: {rerun['peak_mib']:,.1f} MiB" if 'peak_mib' in rerun else ""))
+        st.dataframe(pd.DataFrame(profile.stages), hide_index=True, use_container_width=True)
+        st.dataframe(
+            pd.DataFrame({'figure': list(profile.figures), 'KiB': [size / 1024 for size in profile.figures.values()]}),
+            hide_index=True, use_container_width=True
+        )
 
 st.markdown("<br><br>", unsafe_allow_html=True)
 st.markdown("---")
-st.caption("Data upto 8th November 2025")
+st.caption(f"Data upto {format_day(snapshot.data_until)}" if pd.notna(snapshot.data_until) else "No mission data")
+
+profile.log(tab=active_tab, filters=filter_state, granularity=trend_granularity, cache=result_cache.stats())
@@ -0,0 +1,511 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+from cube import build_cube, merge_cubes
+from outliers import classify_outliers, rules_hash
+from schema import MISSION_SCHEMA, apply_schema, concat_frames
+from sketches import build_sketches, merge_sketches
+from stock import STOCK_FILE, load_stock, stock_stamp
+
+# Bump whenever the processing below changes so stale cache files are rebuilt
+CACHE_VERSION = 7
+CACHE_DIR = ".cache"
+
+# Bytes hashed at the start and end of the ingested prefix to tell an appended
+# export from a truncated or rotated one
+EDGE_BYTES = 1 << 16
+# Appended Parquet parts kept per source before they are compacted into one
+MAX_PARTS = 16
+# Exports larger than this are parsed and processed in blocks of this many
+# bytes while pyarrow reads ahead, instead of as one frame
+CHUNK_BYTES = 64 << 20
+
+SOURCES = {
+    'infeed': "infeed_6.csv",
+    'outfeed': "outfeed_6.csv",
+    'transfer': "transfer_6.csv",
+    'stock': STOCK_FILE,
+}
+
+# Creation, start and end (date, time) column pairs for each mission export
+TIMESTAMP_COLUMNS = {
+    'infeed': {
+        'created': ('INFEED_MISSION_CDATE', 'INFEED_MISSION_CTIME'),
+        'start': ('INFEED_MISSION_START_DATE', 'INFEED_MISSION_START_TIME'),
+        'end': ('INFEED_MISSION_END_DATE', 'INFEED_MISSION_END_TIME'),
+    },
+    'outfeed': {
+        'created': ('OUTFEED_MISSION_CDATE', 'OUTFEED_MISSION_CTIME'),
+        'start': ('OUTFEED_MISSION_START_DATE', 'OUTFEED_MISSION_START_TIME'),
+        'end': ('OUTFEED_MISSION_END_DATE', 'OUTFEED_MISSION_END_TIME'),
+    },
+    'transfer': {
+        'created': ('CDATE', 'CTIME'),
+        'start': ('TRANSFER_MISSION_START_DATE', 'TRANSFER_MISSION_START_TIME'),
+        'end': ('TRANSFER_MISSION_END_DATE', 'TRANSFER_MISSION_END_TIME'),
+    },
+}
+
+DATE_FORMAT = '%d-%m-%Y'
+
+MISSION_TYPES = ('infeed', 'outfeed', 'transfer')
+
+# Export-specific columns renamed to the canonical mission table names
+RENAMED_COLUMNS = {
+    'infeed': {'INFEED_MISSION_STATUS': 'MISSION_STATUS', 'INFEED_MISSION_IS_DELETED': 'IS_DELETED'},
+    'outfeed': {'OUTFEED_MISSION_STATUS': 'MISSION_STATUS', 'OUTFEED_MISSION_IS_DELETED': 'IS_DELETED'},
+    'transfer': {'TRANSFER_MISSION_STATUS': 'MISSION_STATUS', 'TRANSFER_MISSION_IS_DELETED': 'IS_DELETED'},
+}
+
+# Columns of the unified mission table, after the leading mission_type column.
+# Transfers carry no pallet status, so PALLET_STATUS_NAME is empty for them.
+MISSION_COLUMNS = [
+    'PRODUCT_NAME', 'PRODUCT_VARIANT_ID', 'AREA_ID', 'PALLET_STATUS_NAME', 'SHIFT_ID',
+    'MISSION_STATUS', 'IS_DELETED', 'created_datetime', 'start_datetime', 'end_datetime',
+    'duration_minutes', 'outlier_reason', 'is_outlier', 'month_key',
+]
+
+# Types the raw export columns are read with. Dates and times stay strings
+# for combine_timestamps; columns not listed here are not read at all.
+_MISSION_EXPORT_TYPES = {
+    'PRODUCT_NAME': pa.string(),
+    'PRODUCT_VARIANT_ID': pa.int32(),
+    'AREA_ID': pa.int8(),
+    'PALLET_STATUS_NAME': pa.string(),
+    'SHIFT_ID': pa.int8(),
+}
+EXPORT_COLUMN_TYPES = {
+    mission_type: {
+        **_MISSION_EXPORT_TYPES,
+        **{column: pa.int8() if column.endswith('IS_DELETED') else pa.string() for column in renamed},
+        **{column: pa.string() for pair in TIMESTAMP_COLUMNS[mission_type].values() for column in pair},
+    }
+    for mission_type, renamed in RENAMED_COLUMNS.items()
+}
+
+
+def _parse_distinct(columns, parse):
+    """Parse several string columns through one shared table of distinct values"""
+    values = np.concatenate([np.asarray(col, dtype=object) for col in columns])
+    codes, uniques = pd.factorize(values)
+    parsed = np.append(parse(uniques), parse([None]))  # code -1 (missing) -> NaT
+    parsed = parsed[codes]
+    return np.split(parsed, np.cumsum([len(col) for col in columns])[:-1])
+
+
+def combine_timestamps(df, pairs):
+    """Add a <kind>_datetime column for each (date, time) column pair
+
+    Exports only carry a few hundred distinct dates and at most 86,400 distinct
+    times, so each distinct string is parsed once and the date and time parts
+    are combined numerically instead of concatenating strings per row.
+    """
+    dates = _parse_distinct(
+        [df[date_col] for date_col, _ in pairs.values()],
+        lambda v: pd.to_datetime(pd.Index(v, dtype=object), format=DATE_FORMAT, errors='coerce').values
+    )
+    times = _parse_distinct(
+        [df[time_col] for _, time_col in pairs.values()],
+        lambda v: pd.to_timedelta(pd.Index(v, dtype=object), errors='coerce').values
+    )
+    for (kind, _), date_values, time_values in zip(pairs.items(), dates, times):
+        df[f'{kind}_datetime'] = date_values + time_values
+    return df
+
+
+def parse_timestamps(df, mission_type):
+    """Add created/start/end datetimes and duration in minutes to a mission export"""
+    df = combine_timestamps(df, TIMESTAMP_COLUMNS[mission_type])
+
+    # Calculate duration in minutes
+    df['duration_minutes'] = (df['end_datetime'] - df['start_datetime']).dt.total_seconds() / 60
+    return df
+
+
+def process_missions(df, mission_type):
+    """Convert a mission export into canonical mission table columns"""
+    df = parse_timestamps(df, mission_type)
+    df = df.rename(columns=RENAMED_COLUMNS[mission_type])
+
+    # Standardize mission status values to uppercase for consistent grouping
+    df['MISSION_STATUS'] = df['MISSION_STATUS'].str.upper()
+
+    df['outlier_reason'] = classify_outliers(df, mission_type)
+    df['is_outlier'] = df['outlier_reason'].notna()
+    df['month_key'] = month_key(df['created_datetime'])
+    return apply_schema(df.reindex(columns=MISSION_COLUMNS), MISSION_SCHEMA)
+
+
+def month_key(datetimes):
+    """Return year * 100 + month for each timestamp, 0 where it is missing"""
+    datetimes = pd.Series(datetimes)
+    keys = datetimes.dt.year * 100 + datetimes.dt.month
+    return keys.fillna(0).astype(np.int32).values
+
+
+def format_month_key(key):
+    """Render a month key such as 202506 as '2025-06'"""
+    return f"{key // 100}-{key % 100:02d}"
+
+
+def format_day(timestamp):
+    """Render a timestamp's date as '8th November 2025'"""
+    day = timestamp.day
+    suffix = 'th' if 11 <= day % 100 <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+    return f"{day}{suffix} {timestamp:%B %Y}"
+
+
+def build_missions(frames):
+    """Stack processed infeed, outfeed and transfer frames into one mission table
+
+    Rows are ordered by creation month (mission type order is kept within a
+    month) so every month occupies one contiguous row range, see month_index.
+    """
+    frames = [frames[mission_type] for mission_type in MISSION_TYPES]
+    missions = concat_frames(frames, MISSION_SCHEMA)
+    codes = np.repeat(np.arange(len(frames), dtype=np.int8), [len(f) for f in frames])
+    missions.insert(0, 'mission_type', pd.Categorical.from_codes(codes, categories=MISSION_TYPES))
+    order = np.argsort(missions['month_key'].values, kind='stable')
+    return missions.take(order).reset_index(drop=True)
+
+
+def month_index(missions):
+    """Map each month key to the (start, stop) row offsets of a month-sorted table"""
+    keys, starts = np.unique(missions['month_key'].values, return_index=True)
+    stops = np.append(starts[1:], len(missions))
+    return {int(k): (int(start), int(stop)) for k, start, stop in zip(keys, starts, stops) if k}
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """Return size, mtime and content hash identifying a source file"""
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': digest.hexdigest()}
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Cached outlier flags are only valid for the rules they were computed with
+    if manifest.get('version') != CACHE_VERSION or manifest.get('outlier_rules') != rules_hash():
+        return None
+    return manifest
+
+
+def _dump_json(obj, path):
+    with open(path, 'w') as f:
+        json.dump(obj, f)
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_range(path, start, stop):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(stop - start)
+
+
+def _complete_lines(data):
+    """Drop a trailing partial line the exporter may still be writing"""
+    return data[:data.rfind(b'\n') + 1]
+
+
+def _extends_rows(path, offset):
+    """Whether bytes from offset on start a new row: the ingested prefix ends a line, or a newline follows it"""
+    return offset == 0 or b'\n' in (_read_range(path, offset - 1, offset), _read_range(path, offset, offset + 1))
+
+
+def _boundary_hashes(path, offset):
+    """Hash the first and last EDGE_BYTES of the already ingested prefix"""
+    head = _read_range(path, 0, min(EDGE_BYTES, offset))
+    edge = _read_range(path, max(0, offset - EDGE_BYTES), offset)
+    return hashlib.sha1(head).hexdigest(), hashlib.sha1(edge).hexdigest()
+
+
+def _csv_options(name, columns=None, block_size=None):
+    types = EXPORT_COLUMN_TYPES[name]
+    read_options = pa_csv.ReadOptions(column_names=columns, use_threads=True)
+    if block_size:
+        read_options.block_size = block_size
+    convert_options = pa_csv.ConvertOptions(
+        column_types=types,
+        include_columns=[col for col in columns or types if col in types],
+        include_missing_columns=True,
+        strings_can_be_null=True,
+    )
+    return {'read_options': read_options, 'convert_options': convert_options}
+
+
+def read_export(name, data, columns=None):
+    """Read export CSV bytes (with a header unless columns is given) with pyarrow's multithreaded reader
+
+    Only the columns of EXPORT_COLUMN_TYPES are read, already typed.
+    """
+    if not data.strip():
+        return pa.schema(EXPORT_COLUMN_TYPES[name]).empty_table().to_pandas()
+    return pa_csv.read_csv(pa.BufferReader(data), **_csv_options(name, columns)).to_pandas()
+
+
+def iter_export(name, data, columns=None, block_size=CHUNK_BYTES):
+    """Yield export CSV bytes as frames of about block_size bytes each, in file order
+
+    pyarrow parses the next block on its own threads while the caller
+    processes the current one.
+    """
+    reader = pa_csv.open_csv(pa.BufferReader(data), **_csv_options(name, columns, block_size))
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def _parse_rows(name, data, columns=None, chunk_bytes=CHUNK_BYTES):
+    """Parse CSV bytes (with a header unless columns is given) into processed rows"""
+    try:
+        if chunk_bytes and len(data) > chunk_bytes:
+            frames = [process_missions(df, name) for df in iter_export(name, data, columns, chunk_bytes)]
+            return concat_frames(frames, MISSION_SCHEMA)
+        return process_missions(read_export(name, data, columns), name)
+    except pa.ArrowInvalid:
+        # Values that do not fit the declared types: let pandas infer the columns
+        if columns is None:
+            df = pd.read_csv(io.BytesIO(data))
+        else:
+            df = pd.read_csv(io.BytesIO(data), header=None, names=columns)
+        return process_missions(df, name)
+
+
+def _read_parts(name, cache_dir, files):
+    frames = [pd.read_parquet(os.path.join(cache_dir, f)) for f in files]
+    if len(frames) == 1:
+        return frames[0]
+    return concat_frames(frames, MISSION_SCHEMA)
+
+
+def _remove_stale(cache_dir, old_files, keep):
+    for f in set(old_files) - set(keep):
+        try:
+            os.remove(os.path.join(cache_dir, f))
+        except OSError:
+            pass
+
+
+def sync_table(name, data_dir=".", cache_dir=None, previous=None, chunk_bytes=CHUNK_BYTES, load=True):
+    """Bring one source's processed frame up to date with its export
+
+    Returns (frame, status, appended_rows) where status is 'cached' when the
+    export is unchanged, 'appended' when only rows added after the last sync
+    were parsed and 'rebuilt' when the whole export was re-parsed (first load,
+    or the file was truncated or rotated). previous is the frame returned by
+    the last sync; passing it avoids reading the cached Parquet back. Exports
+    over chunk_bytes are parsed in blocks as they are read (None parses them
+    in one piece). With load=False and no previous frame, the cached rows are
+    not read back and frame is None unless the export was rebuilt.
+    """
+    source_path = os.path.join(data_dir, SOURCES[name])
+    cache_dir = cache_dir or os.path.join(data_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    manifest_path = os.path.join(cache_dir, f"{name}.json")
+    manifest = _read_manifest(manifest_path)
+    if manifest and not all(os.path.exists(os.path.join(cache_dir, f)) for f in manifest['files']):
+        manifest = None
+
+    stat = os.stat(source_path)
+    if manifest and (manifest['source']['size'], manifest['source']['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        fingerprint = manifest['source']
+    else:
+        fingerprint = file_fingerprint(source_path)
+
+    if manifest and manifest['source']['sha1'] == fingerprint['sha1']:
+        if manifest['source'] != fingerprint:
+            # Touched but unchanged file: keep the data, refresh size/mtime
+            manifest['source'] = fingerprint
+            _write_atomic(manifest_path, lambda p: _dump_json(manifest, p))
+        if previous is None and load:
+            previous = _read_parts(name, cache_dir, manifest['files'])
+        return previous, 'cached', None
+
+    offset = manifest['offset'] if manifest else 0
+    if (manifest and fingerprint['size'] > offset
+            and _boundary_hashes(source_path, offset) == (manifest['head_sha1'], manifest['edge_sha1'])
+            and _extends_rows(source_path, offset)):
+        # Append-only growth: parse just the new complete lines, leaving a
+        # trailing partial line the exporter may still be writing for later
+        data = _complete_lines(_read_range(source_path, offset, fingerprint['size']))
+        tail = _parse_rows(name, data, manifest['columns'], chunk_bytes)
+        files = list(manifest['files'])
+        if len(tail):
+            files.append(f"{name}-{fingerprint['sha1'][:16]}.parquet")
+            _write_atomic(os.path.join(cache_dir, files[-1]), lambda p: tail.to_parquet(p, index=False))
+        base = previous
+        if base is None and (load or len(files) > MAX_PARTS):
+            base = _read_parts(name, cache_dir, manifest['files'])
+        df = concat_frames([base, tail], MISSION_SCHEMA) if len(tail) and base is not None else base
+        if len(files) > MAX_PARTS:
+            files = [f"{name}-{fingerprint['sha1'][:16]}-compact.parquet"]
+            _write_atomic(os.path.join(cache_dir, files[0]), lambda p: df.to_parquet(p, index=False))
+        status, columns = 'appended', manifest['columns']
+        offset += len(data)
+    else:
+        # The whole export, including a last line without a newline: if the
+        # exporter later extends that line, the next sync rebuilds again
+        data = _read_range(source_path, 0, fingerprint['size'])
+        columns = list(pd.read_csv(io.BytesIO(data), nrows=0).columns)
+        df = tail = _parse_rows(name, data, chunk_bytes=chunk_bytes)
+        files = [f"{name}-{fingerprint['sha1'][:16]}.parquet"]
+        _write_atomic(os.path.join(cache_dir, files[0]), lambda p: df.to_parquet(p, index=False))
+        status, offset = 'rebuilt', len(data)
+
+    head_sha1, edge_sha1 = _boundary_hashes(source_path, offset)
+    new_manifest = {
+        'version': CACHE_VERSION, 'outlier_rules': rules_hash(), 'source': fingerprint, 'files': files, 'columns': columns,
+        'offset': offset, 'rows': manifest['rows'] + len(tail) if status == 'appended' else len(df),
+        'head_sha1': head_sha1, 'edge_sha1': edge_sha1,
+    }
+    _write_atomic(manifest_path, lambda p: _dump_json(new_manifest, p))
+    if manifest:
+        _remove_stale(cache_dir, manifest['files'], files)
+    return df, status, tail
+
+
+def source_manifest(name, data_dir=".", cache_dir=None):
+    """Cache manifest of one source (fingerprint, rows, parts), None when there is no valid cache"""
+    return _read_manifest(os.path.join(cache_dir or os.path.join(data_dir, CACHE_DIR), f"{name}.json"))
+
+
+def load_table(name, data_dir=".", cache_dir=None):
+    """Load one source as a processed frame, reusing its columnar cache when valid"""
+    return sync_table(name, data_dir, cache_dir)[0]
+
+
+def sync_tables(data_dir=".", cache_dir=None, previous=None, chunk_bytes=CHUNK_BYTES, load=MISSION_TYPES):
+    """sync_table every mission export concurrently; returns {name: (frame, status, appended_rows)}
+
+    Parsing happens in pyarrow and most processing in numpy and pandas
+    kernels, which release the GIL, so the exports load in parallel. Only
+    the exports named in load are read back from the cache when no previous
+    frame is given for them, see sync_table. Stock is not cached, see
+    stock.load_stock.
+    """
+    previous = previous or {}
+    cache_dir = cache_dir or os.path.join(data_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=len(MISSION_TYPES)) as pool:
+        futures = {
+            name: pool.submit(sync_table, name, data_dir, cache_dir, previous.get(name), chunk_bytes, name in load)
+            for name in MISSION_TYPES
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def load_tables(data_dir=".", cache_dir=None):
+    """Load the unified mission table through the columnar cache, and the stock snapshot"""
+    frames = {name: synced[0] for name, synced in sync_tables(data_dir, cache_dir).items()}
+    return build_missions(frames), load_stock(data_dir)
+
+
+class IncrementalLoader:
+    """Keep the processed tables in memory and ingest only rows appended to the exports
+
+    The mission cube and latency sketches are kept alongside the tables and
+    appended rows are merged into them. Sources that were truncated or rotated are rebuilt in full by
+    sync_table. The stock snapshot is re-read whenever its export changes.
+    refresh() is safe to call from a file watcher thread.
+    """
+
+    def __init__(self, data_dir=".", cache_dir=None, chunk_bytes=CHUNK_BYTES):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.chunk_bytes = chunk_bytes
+        self.frames = {}
+        self.missions = None
+        self.stock = None
+        self.cube = None
+        self.sketches = None
+        self._lock = threading.Lock()
+
+    def source_stamp(self):
+        """Cheap (size, mtime) stamp of every export, for use as a cache key"""
+        stats = [os.stat(os.path.join(self.data_dir, SOURCES[name])) for name in SOURCES]
+        return tuple((s.st_size, s.st_mtime_ns) for s in stats)
+
+    def _sync_stock(self):
+        """Re-read the stock snapshot if its export changed; returns 'cached' or 'rebuilt'"""
+        if self.stock is not None and self.stock.stamp == stock_stamp(self.data_dir):
+            return 'cached'
+        self.stock = load_stock(self.data_dir)
+        return 'rebuilt'
+
+    def refresh(self):
+        """Sync every export and return the statuses reported by sync_table"""
+        with self._lock:
+            statuses, tails = {}, {}
+            synced = sync_tables(self.data_dir, self.cache_dir, self.frames, self.chunk_bytes)
+            for name, (frame, status, tail) in synced.items():
+                self.frames[name], statuses[name], tails[name] = frame, status, tail
+            mission_statuses = {statuses[t] for t in MISSION_TYPES}
+            if self.missions is None or 'rebuilt' in mission_statuses:
+                self.missions = build_missions({t: self.frames[t] for t in MISSION_TYPES})
+                self.cube = build_cube(self.missions)
+                self.sketches = build_sketches(self.missions)
+            elif 'appended' in mission_statuses:
+                self.missions = build_missions({t: self.frames[t] for t in MISSION_TYPES})
+                appended = build_missions({
+                    t: tails[t] if statuses[t] == 'appended' else self.frames[t].iloc[0:0]
+                    for t in MISSION_TYPES
+                })
+                self.cube = merge_cubes(self.cube, build_cube(appended))
+                self.sketches = merge_sketches(self.sketches, build_sketches(appended))
+            statuses['stock'] = self._sync_stock()
+            return statuses
+
+    def tables(self):
+        """Refresh and return the current (missions, stock snapshot, cube, latency sketches)"""
+        self.refresh()
+        with self._lock:
+            return self.missions, self.stock, self.cube, self.sketches
+
+
+def watch_sources(callback, data_dir="."):
+    """Call callback(name) whenever an export is written; returns the observer
+
+    Returns None when watchdog is not installed, in which case exports are only
+    picked up when the caller next refreshes.
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    names = {os.path.abspath(os.path.join(data_dir, path)): name for name, path in SOURCES.items()}
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            name = names.get(os.path.abspath(getattr(event, 'dest_path', '') or event.src_path))
+            if name and event.event_type in ('modified', 'created', 'moved', 'closed'):
+                callback(name)
+
+    observer = Observer()
+    observer.schedule(_Handler(), os.path.abspath(data_dir), recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
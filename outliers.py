@@ -0,0 +1,161 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Outlier thresholds in minutes. 'default' applies to every mission (None
+# disables the rule); overrides are matched on mission type, then AREA_ID,
+# then PRODUCT_NAME, and the most specific match wins.
+OUTLIER_RULES = {
+    'max_duration': {'default': 3, 'mission_type': {}, 'area': {}, 'product': {}},
+    'max_queue_wait': {'default': None, 'mission_type': {}, 'area': {}, 'product': {}},
+}
+
+OVERRIDE_COLUMNS = (('mission_type', 'mission_type'), ('area', 'AREA_ID'), ('product', 'PRODUCT_NAME'))
+
+
+def rules_hash(rules=OUTLIER_RULES):
+    """Stable hash of a rule set, equal before and after a JSON round trip (int AREA_ID keys become strings)"""
+    canonical = json.dumps(json.loads(json.dumps(rules, default=str)), sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def long_duration_label(rules=OUTLIER_RULES):
+    default = rules['max_duration']['default']
+    return f"More than {default:g} mins" if default is not None else 'Duration Too Long'
+
+
+def outlier_reasons(rules=OUTLIER_RULES):
+    """Reason codes in priority order; a mission gets the first one that applies"""
+    return [
+        'Missing Start Time',
+        'Missing End Time',
+        'Negative Duration',
+        long_duration_label(rules),
+        'Queue Wait Too Long',
+    ]
+
+
+def describe_outlier_rules(rules=OUTLIER_RULES):
+    """Short human readable summary of the active rules for captions"""
+    parts = []
+    if rules['max_duration']['default'] is not None:
+        parts.append(f"> {rules['max_duration']['default']:g} mins")
+    parts.append('negative duration')
+    if rules['max_queue_wait']['default'] is not None:
+        parts.append(f"queue wait > {rules['max_queue_wait']['default']:g} mins")
+    parts.append('missing start/end time')
+    return ', '.join(parts[:-1]) + ' or ' + parts[-1]
+
+
+def resolve_threshold(df, rule, mission_type=None):
+    """Per-row threshold for one rule, NaN where the rule is disabled"""
+    default = np.nan if rule['default'] is None else rule['default']
+    threshold = np.full(len(df), default, dtype=float)
+    for key, column in OVERRIDE_COLUMNS:
+        overrides = rule.get(key)
+        if not overrides:
+            continue
+        if key == 'mission_type' and mission_type is not None:
+            if mission_type in overrides:
+                threshold[:] = overrides[mission_type]
+            continue
+        mapped = pd.Series(df[column]).map(overrides).to_numpy(dtype=float, na_value=np.nan)
+        threshold = np.where(np.isnan(mapped), threshold, mapped)
+    return threshold
+
+
+def classify_outliers(df, mission_type=None, rules=OUTLIER_RULES):
+    """Assign outlier reason codes to every mission in one vectorized pass
+
+    Returns a categorical with the categories of outlier_reasons(rules), missing
+    where the mission is normal. mission_type is needed when df is a single
+    export without a mission_type column.
+    """
+    start_missing = df['start_datetime'].isna().to_numpy()
+    end_missing = df['end_datetime'].isna().to_numpy()
+    duration = df['duration_minutes'].to_numpy(dtype=float, na_value=np.nan)
+    queue_wait = ((df['start_datetime'] - df['created_datetime']).dt.total_seconds() / 60).to_numpy(
+        dtype=float, na_value=np.nan
+    )
+
+    with np.errstate(invalid='ignore'):
+        conditions = [
+            start_missing,
+            end_missing,
+            duration < 0,
+            duration > resolve_threshold(df, rules['max_duration'], mission_type),
+            queue_wait > resolve_threshold(df, rules['max_queue_wait'], mission_type),
+        ]
+    codes = np.select(conditions, np.arange(len(conditions), dtype=np.int8), default=-1).astype(np.int8)
+    return pd.Categorical.from_codes(codes, categories=outlier_reasons(rules))
+
+
+# Outlier table columns and the mission table columns they are built from
+OUTLIER_TABLE_COLUMNS = {
+    'Type': 'mission_type',
+    'Product': 'PRODUCT_NAME',
+    'Status': 'MISSION_STATUS',
+    'Duration (min)': 'duration_minutes',
+    'Reason': 'outlier_reason',
+    'Date': 'created_datetime',
+}
+
+
+def outlier_table(outliers):
+    """Format outlier missions as the display table, one column at a time"""
+    return pd.DataFrame({
+        'Type': outliers['mission_type'].cat.rename_categories(str.capitalize),
+        'Product': outliers['PRODUCT_NAME'],
+        'Status': outliers['MISSION_STATUS'],
+        'Duration (min)': outliers['duration_minutes'].round(2),
+        'Reason': outliers['outlier_reason'],
+        'Date': outliers['created_datetime'].dt.strftime('%d-%m-%Y'),
+    })
+
+
+def _sort_key(values):
+    """Numeric array ordering a column the way the table should sort it"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype=float)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return pd.factorize(values, sort=True)[0].astype(float)
+
+
+def top_k_positions(key, k, descending=True):
+    """Row positions of the k largest (or smallest) keys in order, ties in row order
+
+    Only the rows up to the k-th key are sorted: the k-th key is found with a
+    partition, and rows tied with it are taken in row order, so the result is
+    always a prefix of the full (key, row) order and pages never repeat or
+    skip rows. Missing keys sort last.
+    """
+    key = -key if descending else key
+    key = np.where(np.isnan(key), np.inf, key)
+    if k < len(key):
+        kth = np.partition(key, k - 1)[k - 1]
+        before = np.flatnonzero(key < kth)
+        candidates = np.concatenate([before, np.flatnonzero(key == kth)[:k - len(before)]])
+    else:
+        candidates = np.arange(len(key))
+    return candidates[np.lexsort((candidates, key[candidates]))]
+
+
+def outlier_page(outliers, sort_by='Duration (min)', descending=True, page=0, page_size=50):
+    """One sorted page of the outlier table and the total number of outliers
+
+    Only the rows up to the end of the requested page are ordered (a partial
+    sort), and only the page itself is formatted for display.
+    """
+    total = len(outliers)
+    start = page * page_size
+    if start >= total:
+        return outlier_table(outliers.iloc[0:0]), total
+    stop = min(start + page_size, total)
+    key = _sort_key(outliers[OUTLIER_TABLE_COLUMNS[sort_by]])
+    positions = top_k_positions(key, stop, descending)[start:stop]
+    return outlier_table(outliers.iloc[positions]), total
@@ -0,0 +1,160 @@
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+LOGGER_NAME = "dashboard.profile"
+
+
+def get_profile_logger():
+    """Logger for the per-rerun JSON lines, writing bare messages to stderr unless configured"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+# Users of start_memory_tracing and the open PeakMemory measurements. tracemalloc
+# is process-wide and has a single peak, shared by every session's reruns.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_measurements = weakref.WeakSet()
+
+
+def start_memory_tracing():
+    """Start tracemalloc, or keep it running, for one more user
+
+    Numpy and pandas buffers are traced too. Tracing stays on until every
+    user has called stop_memory_tracing.
+    """
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def stop_memory_tracing():
+    """Release one start_memory_tracing; tracemalloc stops with the last user
+
+    Stopped tracing means reruns no longer pay for allocation tracing.
+    """
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users = max(_tracing_users - 1, 0)
+        if not _tracing_users and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class PeakMemory:
+    """Peak bytes traced above the bytes traced when the measurement started
+
+    tracemalloc keeps one peak for the whole process. A new measurement
+    resets it, but first folds it into every open measurement, so
+    measurements that overlap (nested stages, other sessions' reruns) each
+    keep their own peak. An overlapping measurement still counts the other
+    one's allocations. Needs tracing on, see start_memory_tracing.
+    """
+
+    def __init__(self):
+        with _tracing_lock:
+            _fold_peak()
+            tracemalloc.reset_peak()
+            self.baseline = self._peak = tracemalloc.get_traced_memory()[0]
+            self.closed = False
+            _measurements.add(self)
+
+    def bytes(self):
+        """Peak bytes above the baseline so far, or until close"""
+        with _tracing_lock:
+            if self.closed:
+                return self._peak - self.baseline
+            return max(self._peak, tracemalloc.get_traced_memory()[1]) - self.baseline
+
+    def close(self):
+        """Stop following the process peak, keeping the peak reached so far"""
+        with _tracing_lock:
+            if not self.closed:
+                self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+                self.closed = True
+                _measurements.discard(self)
+
+
+def _fold_peak():
+    peak = tracemalloc.get_traced_memory()[1]
+    for measurement in _measurements:
+        measurement._peak = max(measurement._peak, peak)
+
+
+class RerunProfile:
+    """Named stage timers, memory counters and figure payload sizes for one script rerun
+
+    Timers are always on (a perf_counter call per stage). Memory counters
+    need tracemalloc, which slows reruns down noticeably, so they are only
+    collected with trace_memory.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.memory = None
+        if trace_memory:
+            start_memory_tracing()
+            self.memory = PeakMemory()
+            # Tracing is released when the rerun is logged, or when an
+            # unlogged profile (an interrupted rerun) is garbage collected
+            self._release = weakref.finalize(self, _release_tracing, self.memory)
+        self.stages = []
+        self.figures = {}
+        self.started = time.perf_counter()
+        self.logged = False
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block (and its peak allocation when tracing) as stage `name`"""
+        memory = PeakMemory() if self.trace_memory else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {'stage': name, 'ms': round((time.perf_counter() - start) * 1000, 2)}
+            if memory is not None:
+                record['peak_mib'] = round(memory.bytes() / 2**20, 2)
+                memory.close()
+            self.stages.append(record)
+
+    def figure(self, name, fig_json):
+        """Record the serialized size of a figure sent to the browser"""
+        self.figures[name] = len(fig_json)
+
+    def summary(self, **extra):
+        """Everything recorded so far as one JSON-serializable dict"""
+        summary = {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'stages': {record['stage']: record['ms'] for record in self.stages},
+            'figure_bytes': dict(self.figures),
+        }
+        if self.trace_memory:
+            summary['peak_mib'] = round(self.memory.bytes() / 2**20, 2)
+            summary['stage_peak_mib'] = {record['stage']: record['peak_mib'] for record in self.stages}
+        summary.update(extra)
+        return summary
+
+    def log(self, **extra):
+        """Emit the summary as a single structured JSON log line"""
+        get_profile_logger().info(json.dumps({'event': 'rerun', **self.summary(**extra)}, default=str))
+        self.logged = True
+        if self.trace_memory:
+            self._release()
+
+
+def _release_tracing(memory):
+    memory.close()
+    stop_memory_tracing()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pandas as pd
+
+from engine import Snapshot
+from ingest import watch_sources
+
+# Seconds between checks of the exports' (size, mtime) stamps when no file event arrives
+REFRESH_INTERVAL = 30
+# Seconds a snapshot is served before it is rebuilt even if no export changed,
+# which also moves the stock ages forward
+SNAPSHOT_TTL = 15 * 60
+
+
+class SnapshotRefresher:
+    """Serve a ready Snapshot and rebuild it in a background thread
+
+    The worker wakes on a file event (when watchdog is installed), every
+    interval seconds to compare the exports' stamps, and once the snapshot
+    is older than ttl. A new snapshot is built completely before it replaces
+    the current one in a single assignment, so readers always get a whole
+    snapshot and only ever wait for the first one. A failed refresh keeps
+    the previous snapshot and is reported in error.
+    """
+
+    def __init__(self, loader, interval=REFRESH_INTERVAL, ttl=SNAPSHOT_TTL):
+        self.loader = loader
+        self.interval = interval
+        self.ttl = ttl
+        self.snapshot = None
+        self.built_at = None
+        self.refreshes = 0
+        self.error = None
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    def start(self, watch=True):
+        """Start the worker (and the file watcher); returns self"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+            if watch:
+                self._observer = watch_sources(lambda name: self._wake.set(), self.loader.data_dir)
+        return self
+
+    def stop(self):
+        """Stop the worker and the file watcher"""
+        self._stopped.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+    def current(self, timeout=None):
+        """The latest snapshot; blocks only until the first refresh attempt finished"""
+        self._ready.wait(timeout)
+        return self.snapshot
+
+    def request(self):
+        """Check the exports now instead of at the next interval"""
+        self._wake.set()
+
+    def age(self):
+        """Seconds since the current snapshot was built"""
+        return time.monotonic() - self.built_at if self.built_at is not None else None
+
+    def _due(self):
+        if self.snapshot is None or self.age() >= self.ttl:
+            return True
+        return self.loader.source_stamp() != self.snapshot.stamp
+
+    def _build(self):
+        # Stamp first: an export written during the refresh leaves the new
+        # snapshot with an outdated stamp and is picked up on the next check
+        stamp = self.loader.source_stamp()
+        missions, stock, cube, sketches = self.loader.tables()
+        if self.snapshot is not None and stock.stamp == self.snapshot.stock.stamp:
+            # Unchanged stock export: age the same pallets against the current time
+            stock = stock.as_of(pd.Timestamp.now())
+        snapshot = Snapshot(missions, stock, cube, sketches, stamp, getattr(self.loader, 'view', None))
+        self.snapshot, self.built_at = snapshot, time.monotonic()
+        self.refreshes += 1
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                if self._due():
+                    self._build()
+                self.error = None
+            except Exception as e:
+                self.error = e
+            self._ready.set()
+            self._wake.wait(self.interval)
@@ -0,0 +1,96 @@
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def normalize_filter_state(months=(), mission_types=(), statuses=(), outlier_option='BOTH'):
+    """Order-independent, hashable key for a set of sidebar selections"""
+    return (
+        tuple(sorted(months or ())),
+        tuple(sorted(mission_types or ())),
+        tuple(sorted(statuses or ())),
+        outlier_option,
+    )
+
+
+def estimate_size(value):
+    """Approximate memory held by a cached value, in bytes"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + sys.getsizeof(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Least-recently-used cache of per-filter-state results (KPI dicts, figure JSON, tables)
+
+    Entries are keyed on (data snapshot, filter state, name) and bounded both
+    by count and by estimated size, so results are never served for another
+    snapshot than the one they were computed from. Sessions still on an older
+    snapshot after a reload keep their entries until they age out, without
+    evicting those of the newer one.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, snapshot, state, name, compute):
+        """Return the cached result for (snapshot, state, name), computing and storing it on a miss"""
+        key = (snapshot, state, name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Column dtypes of the processed tables. 'category' columns hold a handful of
+# distinct names or statuses; small ints fall back to the matching nullable
+# dtype when a column has missing values. Columns not listed keep the dtype
+# they were parsed with.
+MISSION_SCHEMA = {
+    'PRODUCT_NAME': 'category',
+    'PRODUCT_VARIANT_ID': 'int32',
+    'AREA_ID': 'int8',
+    'PALLET_STATUS_NAME': 'category',
+    'SHIFT_ID': 'int8',
+    'MISSION_STATUS': 'category',
+    'IS_DELETED': 'int8',
+    'month_key': 'int32',
+}
+
+STOCK_SCHEMA = {
+    'CURRENT_STOCK_DETAILS_ID': 'int32',
+    'PRODUCT_NAME': 'category',
+    'PALLET_STATUS_NAME': 'category',
+    'AREA_ID': 'int8',
+    'AGEING_DAYS': 'int32',
+    'QUANTITY': 'int32',
+    'QUALITY_STATUS': 'category',
+}
+
+
+def _convert(values, dtype):
+    if dtype == 'category':
+        return values.astype('category')
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().any():
+        return numeric.astype(dtype.capitalize())
+    return numeric.astype(dtype)
+
+
+def apply_schema(df, schema):
+    """Convert the schema's columns in place and drop empty 'Unnamed' columns
+
+    Exports end every row with trailing commas, which pandas reads as
+    all-empty 'Unnamed: n' columns. Returns df for chaining.
+    """
+    empty = [col for col in df.columns if str(col).startswith('Unnamed:') and df[col].isna().all()]
+    if empty:
+        df.drop(columns=empty, inplace=True)
+    for column, dtype in schema.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = _convert(df[column], dtype)
+    return df
+
+
+def concat_frames(frames, schema):
+    """Concatenate processed frames, keeping the schema's categorical columns categorical
+
+    Each categorical column is given the union of the frames' categories first;
+    plain pd.concat would fall back to object columns when they differ.
+    """
+    frames = [frame.copy(deep=False) for frame in frames]
+    for column, dtype in schema.items():
+        if dtype != 'category' or not all(column in frame.columns for frame in frames):
+            continue
+        values = [frame[column].astype('category') for frame in frames]
+        categories = sorted(set().union(*(v.cat.categories for v in values)))
+        for frame, v in zip(frames, values):
+            frame[column] = v.cat.set_categories(categories)
+    return apply_schema(pd.concat(frames, ignore_index=True), schema)
+
+
+def _default_dtype(values):
+    """dtype pandas would have parsed a schema column with"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return object
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return 'float64' if values.isna().any() else 'int64'
+    return values.dtype
+
+
+def memory_report(tables, schemas):
+    """Per table footprint in bytes with the schema applied and with pandas' default dtypes"""
+    rows = []
+    for name, df in tables.items():
+        compact = int(df.memory_usage(index=True, deep=True).sum())
+        defaults = {column: _default_dtype(df[column]) for column in schemas[name] if column in df.columns}
+        default = int(df.astype(defaults).memory_usage(index=True, deep=True).sum())
+        rows.append({'table': name, 'rows': len(df), 'default_bytes': default, 'schema_bytes': compact})
+    report = pd.DataFrame(rows)
+    report['saved'] = 1 - report['schema_bytes'] / report['default_bytes'].replace(0, np.nan)
+    return report
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_DIMENSIONS, CUBE_SCHEMA
+from schema import concat_frames
+
+# Relative accuracy of the latency percentiles: a reported percentile is within
+# this fraction of the latency actually found at that rank
+SKETCH_ACCURACY = 0.01
+# Latencies shorter than this many minutes (one second) are counted as zero
+SKETCH_MIN_MINUTES = 1 / 60
+# Ratio between the upper and lower bound of a sketch bucket
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+# Latencies sketched per mission: queue wait from creation to start, and execution from start to end
+LATENCIES = ('wait', 'execution')
+
+# Percentiles reported per group
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+# A sketch cell is the mission count of one bucket of one latency in one cube cell
+SKETCH_DIMENSIONS = CUBE_DIMENSIONS + ['latency', 'bucket']
+SKETCH_SCHEMA = {**CUBE_SCHEMA, 'latency': 'category', 'bucket': 'int16'}
+
+
+def latency_minutes(missions):
+    """Wait and execution minutes per mission, NaN where a timestamp is missing"""
+    wait = (missions['start_datetime'] - missions['created_datetime']).dt.total_seconds() / 60
+    return {'wait': wait.to_numpy(dtype=float, na_value=np.nan),
+            'execution': missions['duration_minutes'].to_numpy(dtype=float, na_value=np.nan)}
+
+
+def bucket_keys(minutes):
+    """Sketch bucket of each latency
+
+    Bucket k > 0 holds latencies in (g^(k-2), g^(k-1)] * SKETCH_MIN_MINUTES
+    (g being SKETCH_GAMMA), bucket -k the same negative latencies (bad
+    timestamps) and bucket 0 everything shorter than SKETCH_MIN_MINUTES.
+    """
+    magnitude = np.abs(minutes) / SKETCH_MIN_MINUTES
+    with np.errstate(divide='ignore'):
+        index = np.ceil(np.log(np.maximum(magnitude, 1)) / np.log(SKETCH_GAMMA)) + 1
+    index = np.where(magnitude < 1, 0, np.minimum(index, np.iinfo(np.int16).max))
+    return (np.sign(minutes) * index).astype(np.int16)
+
+
+def bucket_minutes(keys):
+    """Latency a bucket stands for: within SKETCH_ACCURACY of every latency in it"""
+    keys = np.asarray(keys)
+    magnitude = SKETCH_MIN_MINUTES * 2 * SKETCH_GAMMA ** (np.abs(keys) - 1.0) / (SKETCH_GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * magnitude)
+
+
+def build_sketches(missions):
+    """Latency sketches per cube cell: mission counts per (CUBE_DIMENSIONS, latency, bucket)
+
+    Missions without a latency (a missing timestamp) are left out of that
+    latency's sketch. Sketches of any set of cells merge by adding the
+    counts of equal buckets, see merge_sketches and latency_percentiles.
+    """
+    grouped = missions.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=False)
+    cells = grouped.ngroup().to_numpy(dtype=np.int64)
+    dimensions = grouped.size().index.to_frame(index=False)
+    # One int64 key per (cube cell, bucket), counted with a single sort per latency
+    span = 1 << 16
+    frames = []
+    for latency, minutes in latency_minutes(missions).items():
+        known = ~np.isnan(minutes)
+        keys, counts = np.unique(cells[known] * span + bucket_keys(minutes[known]) + span // 2, return_counts=True)
+        sketch = dimensions.iloc[keys // span].reset_index(drop=True)
+        sketch['latency'] = pd.Categorical.from_codes(
+            np.full(len(keys), LATENCIES.index(latency)), categories=list(LATENCIES)
+        )
+        sketch['bucket'] = (keys % span - span // 2).astype(np.int16)
+        sketch['count'] = counts.astype(np.int64)
+        frames.append(sketch)
+    return merge_sketches(*frames)
+
+
+def merge_sketches(*sketches):
+    """Combine sketches built from disjoint sets of missions (e.g. an appended tail)"""
+    stacked = concat_frames(sketches, SKETCH_SCHEMA)
+    stacked['latency'] = stacked['latency'].cat.set_categories(list(LATENCIES))
+    merged = stacked.groupby(SKETCH_DIMENSIONS, observed=True, dropna=False, sort=False)['count'].sum()
+    return merged.astype(np.int64).reset_index()
+
+
+def latency_percentiles(cells, by=(), percentiles=LATENCY_PERCENTILES):
+    """Wait and execution percentiles in minutes per `by` group, merged from sketch cells
+
+    Returns one row per group and latency with the group columns, latency,
+    missions and p50 ... p99. The buckets of every group are merged and
+    walked in order once, so the cost depends on the number of sketch
+    cells, not on the number of missions behind them.
+    """
+    keys = list(by) + ['latency']
+    merged = (
+        cells.groupby(keys + ['bucket'], observed=True, sort=True)['count'].sum()
+        .loc[lambda counts: counts > 0].reset_index()
+    )
+    groups = merged.groupby(keys, observed=True, sort=False)
+    table = groups['count'].sum().rename('missions').reset_index()
+    if merged.empty:
+        for p in percentiles:
+            table[f'p{p}'] = pd.Series(dtype=float)
+        return table
+
+    # Rows are sorted by group then bucket: a group's percentile is the first
+    # of its buckets whose running count passes the rank
+    running = np.cumsum(merged['count'].to_numpy())
+    group = groups.ngroup().to_numpy()
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    before = np.r_[0, running[starts[1:] - 1]]
+    totals = table['missions'].to_numpy()
+    buckets = merged['bucket'].to_numpy()
+    for p in percentiles:
+        rank = np.floor(p / 100 * (totals - 1))
+        table[f'p{p}'] = bucket_minutes(buckets[np.searchsorted(running, before + rank, side='right')])
+    return table
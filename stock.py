@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
+
+from ageing import AGE_BUCKET_EDGES, age_days, ageing_table, check_edges
+from schema import STOCK_SCHEMA, apply_schema
+
+STOCK_FILE = "stock.csv"
+
+# Stock export columns the dashboard uses and the types they are read with;
+# the rest of the export (pallet codes, variant codes, the trailing empty
+# columns) is never parsed
+STOCK_COLUMN_TYPES = {
+    'CURRENT_STOCK_DETAILS_ID': pa.int32(),
+    'PRODUCT_NAME': pa.string(),
+    'PALLET_STATUS_NAME': pa.string(),
+    'AREA_ID': pa.int8(),
+    'AGEING_DAYS': pa.int32(),
+    'QUANTITY': pa.int32(),
+    'QUALITY_STATUS': pa.string(),
+    'LOAD_DATE': pa.string(),
+    'LOAD_TIME': pa.string(),
+}
+LOAD_TIMESTAMP_FORMAT = '%d-%m-%Y %H:%M:%S'
+
+# Pallet statuses kept. Placeholder rows (PALLET_CODE and PRODUCT_NAME 'NA',
+# QUANTITY 0) carry no status and are dropped with them.
+STOCK_PALLET_STATUSES = ('FULL', 'EMPTY')
+
+# Dimensions of the per-selection pallet counts
+STOCK_DIMENSIONS = ['AREA_ID', 'PRODUCT_NAME', 'QUALITY_STATUS', 'PALLET_STATUS_NAME', 'age_days']
+
+# Bytes of CSV parsed and filtered at a time
+STOCK_BLOCK_BYTES = 1 << 20
+
+
+def _real_pallets(batch):
+    """Rows with a product and a FULL or EMPTY status"""
+    product = batch.column('PRODUCT_NAME')
+    return pc.and_(
+        pc.is_in(batch.column('PALLET_STATUS_NAME'), value_set=pa.array(STOCK_PALLET_STATUSES)),
+        pc.and_(pc.is_valid(product), pc.not_equal(product, 'NA')),
+    )
+
+
+def _with_load_datetime(batch):
+    """Replace LOAD_DATE/LOAD_TIME with a load_datetime timestamp column"""
+    joined = pc.binary_join_element_wise(batch.column('LOAD_DATE'), batch.column('LOAD_TIME'), ' ')
+    load = pc.strptime(joined, format=LOAD_TIMESTAMP_FORMAT, unit='ns', error_is_null=True)
+    columns = [name for name in batch.schema.names if name not in ('LOAD_DATE', 'LOAD_TIME')]
+    return pa.RecordBatch.from_arrays(
+        [batch.column(name) for name in columns] + [load], names=columns + ['load_datetime']
+    )
+
+
+def read_stock(path, block_size=STOCK_BLOCK_BYTES):
+    """Stream the stock export and return its real pallets with the compact stock schema
+
+    Each block is filtered and its load timestamp parsed as it is read, so
+    placeholder rows are never converted to pandas.
+    """
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=STOCK_COLUMN_TYPES,
+            include_columns=list(STOCK_COLUMN_TYPES),
+            include_missing_columns=True,
+            strings_can_be_null=True,
+        ),
+    )
+    batches = [_with_load_datetime(batch.filter(_real_pallets(batch))) for batch in reader]
+    if not batches:
+        batches = [_with_load_datetime(pa.RecordBatch.from_pylist([], schema=reader.schema))]
+    pallets = pa.Table.from_batches(batches).to_pandas()
+    pallets['AGEING_DAYS'] = pallets['AGEING_DAYS'].fillna(0)
+    return apply_schema(pallets, STOCK_SCHEMA)
+
+
+class StockSnapshot:
+    """Real pallets of one stock export, with pallet counts indexed by area and product
+
+    cells holds pallet counts and quantities per STOCK_DIMENSIONS, sorted by
+    area, then product, so each area is one contiguous row range of cells
+    (by_area); by_product maps a product to its cell positions. Every area
+    and product selection of the stock tab is answered from those cells
+    through the two indices, without a rescan.
+
+    age_days is counted from each pallet's load date to reference (the time
+    the snapshot was built unless given); the export's AGEING_DAYS is only
+    used for pallets without a load date.
+    """
+
+    def __init__(self, pallets, stamp=None, reference=None):
+        self.reference = pd.Timestamp(reference) if reference is not None else pd.Timestamp.now()
+        self.pallets = pallets.reset_index(drop=True)
+        self.pallets['age_days'] = (
+            age_days(self.pallets['load_datetime'], self.reference)
+            .fillna(self.pallets['AGEING_DAYS']).astype('int32')
+        )
+        cells = (
+            self.pallets.groupby(STOCK_DIMENSIONS, observed=True, dropna=False, sort=False)
+            .agg(pallets=('QUANTITY', 'size'), quantity=('QUANTITY', 'sum'))
+            .reset_index()
+        )
+        areas = cells['AREA_ID'].to_numpy(dtype=float, na_value=np.nan)
+        order = np.lexsort((cells['PRODUCT_NAME'].cat.codes.to_numpy(), areas))
+        self.cells = cells.take(order).reset_index(drop=True)
+        areas = areas[order]
+        keys, starts = np.unique(areas, return_index=True)
+        stops = np.append(starts[1:], len(areas))
+        self.by_area = {int(k): (int(start), int(stop)) for k, start, stop in zip(keys, starts, stops) if k == k}
+        self.by_product = dict(self.cells.groupby('PRODUCT_NAME', observed=True).indices)
+        self.stamp = stamp
+        self._ageing = {}
+
+    def __len__(self):
+        return len(self.pallets)
+
+    def select(self, area=None, product=None):
+        """Cells of one area and/or product, looked up through the indices"""
+        if area is None and product is None:
+            return self.cells
+        if area is not None:
+            start, stop = self.by_area.get(area, (0, 0))
+            positions = np.arange(start, stop)
+            if product is not None:
+                positions = np.intersect1d(positions, self.by_product.get(product, []), assume_unique=True)
+        else:
+            positions = self.by_product.get(product, np.array([], dtype=np.intp))
+        return self.cells.iloc[positions]
+
+    def ageing(self, edges=AGE_BUCKET_EDGES, by=None, area=None, product=None):
+        """Pallets per ageing bucket (by a cell column), computed once per snapshot"""
+        key = (check_edges(edges), by, area, product)
+        if key not in self._ageing:
+            self._ageing[key] = ageing_table(self.select(area, product), key[0], by)
+        return self._ageing[key]
+
+    def as_of(self, reference):
+        """The same pallets aged against another reference time"""
+        return StockSnapshot(self.pallets, self.stamp, reference)
+
+
+def stock_stamp(data_dir="."):
+    """(size, mtime) of the stock export"""
+    stat = os.stat(os.path.join(data_dir, STOCK_FILE))
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_stock(data_dir=".", block_size=STOCK_BLOCK_BYTES):
+    """Read the stock export into a StockSnapshot"""
+    stamp = stock_stamp(data_dir)
+    return StockSnapshot(read_stock(os.path.join(data_dir, STOCK_FILE), block_size), stamp)
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from ingest import SOURCES, source_manifest, sync_table
+
+# Header and first rows of the real infeed export
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), SOURCES['infeed']), 'rb') as f:
+    HEADER, *ROWS = f.read().splitlines(keepends=True)[:31]
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / SOURCES['infeed']
+
+    def write(data, mode='wb'):
+        with open(path, mode) as f:
+            f.write(data)
+
+    return write
+
+
+def sync(tmp_path):
+    return sync_table('infeed', data_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+
+
+def test_append_parses_only_new_rows(tmp_path, export):
+    export(HEADER + b''.join(ROWS[:20]))
+    frame, status, _ = sync(tmp_path)
+    assert (status, len(frame)) == ('rebuilt', 20)
+
+    export(b''.join(ROWS[20:25]), 'ab')
+    frame, status, tail = sync(tmp_path)
+    assert (status, len(tail), len(frame)) == ('appended', 5, 25)
+    assert source_manifest('infeed', cache_dir=str(tmp_path / 'cache'))['offset'] == len(HEADER + b''.join(ROWS[:25]))
+
+    frame, status, _ = sync(tmp_path)
+    assert (status, len(frame)) == ('cached', 25)
+
+
+def test_append_waits_for_a_partial_line(tmp_path, export):
+    export(HEADER + b''.join(ROWS[:20]))
+    sync(tmp_path)
+
+    export(ROWS[20][:10], 'ab')
+    frame, status, tail = sync(tmp_path)
+    assert (status, len(tail), len(frame)) == ('appended', 0, 20)
+
+    export(ROWS[20][10:], 'ab')
+    frame, status, tail = sync(tmp_path)
+    assert (status, len(tail), len(frame)) == ('appended', 1, 21)
+
+    fresh = tmp_path / 'fresh'
+    fresh.mkdir()
+    (fresh / SOURCES['infeed']).write_bytes(HEADER + b''.join(ROWS[:21]))
+    expected = sync(fresh)[0]
+    assert frame.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+def test_truncated_export_is_rebuilt(tmp_path, export):
+    export(HEADER + b''.join(ROWS[:20]))
+    sync(tmp_path)
+
+    export(HEADER + b''.join(ROWS[:10]))
+    frame, status, _ = sync(tmp_path)
+    assert (status, len(frame)) == ('rebuilt', 10)
+
+
+def test_rewritten_prefix_is_rebuilt(tmp_path, export):
+    export(HEADER + b''.join(ROWS[:20]))
+    sync(tmp_path)
+
+    # Same size up to the old offset, so only the boundary hashes can tell
+    export(HEADER + b''.join(ROWS[10:20]) + b''.join(ROWS[:10]) + ROWS[20])
+    frame, status, _ = sync(tmp_path)
+    assert (status, len(frame)) == ('rebuilt', 21)
+
+
+def test_rebuild_keeps_a_last_line_without_newline(tmp_path, export):
+    export(HEADER + b''.join(ROWS[:19]) + ROWS[19].rstrip(b'\r\n'))
+    frame, status, _ = sync(tmp_path)
+    assert (status, len(frame)) == ('rebuilt', 20)
+
+    # The last row was complete: a newline and new rows after it are an append
+    export(b'\n' + b''.join(ROWS[20:22]), 'ab')
+    frame, status, tail = sync(tmp_path)
+    assert (status, len(tail), len(frame)) == ('appended', 2, 22)
+
+
+def test_extended_last_line_is_rebuilt(tmp_path, export):
+    partial = ROWS[19].rstrip(b'\r\n')
+    export(HEADER + b''.join(ROWS[:19]) + partial[:-3])
+    sync(tmp_path)
+
+    # The exporter was still writing that row: it must not be appended twice
+    export(partial[-3:] + b'\n' + ROWS[20], 'ab')
+    frame, status, _ = sync(tmp_path)
+    assert (status, len(frame)) == ('rebuilt', 21)
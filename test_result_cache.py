@@ -0,0 +1,21 @@
+from result_cache import ResultCache
+
+
+def test_snapshots_are_cached_side_by_side():
+    cache = ResultCache(max_entries=3)
+    assert cache.get_or_compute('old', None, 'kpis', lambda: 1) == 1
+    assert cache.get_or_compute('new', None, 'kpis', lambda: 2) == 2
+    # A session still on the old snapshot neither sees nor evicts the new result
+    assert cache.get_or_compute('old', None, 'kpis', lambda: 3) == 1
+    assert cache.get_or_compute('new', None, 'kpis', lambda: 4) == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_older_snapshots_age_out_first():
+    cache = ResultCache(max_entries=2)
+    cache.get_or_compute('old', None, 'kpis', lambda: 1)
+    cache.get_or_compute('new', None, 'kpis', lambda: 2)
+    cache.get_or_compute('new', None, 'figures', lambda: 3)
+    assert cache.get_or_compute('new', None, 'kpis', lambda: 4) == 2
+    assert cache.get_or_compute('old', None, 'kpis', lambda: 5) == 5
+    assert cache.evictions == 2
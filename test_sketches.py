@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from sketches import (
+    SKETCH_ACCURACY, SKETCH_MIN_MINUTES, bucket_keys, bucket_minutes, build_sketches, latency_percentiles,
+    merge_sketches,
+)
+
+# Relative error allowed on top of SKETCH_ACCURACY for float rounding
+TOLERANCE = SKETCH_ACCURACY + 1e-9
+
+
+def test_bucket_minutes_within_accuracy():
+    minutes = np.geomspace(SKETCH_MIN_MINUTES, 10**5, 10**5)
+    for signed in (minutes, -minutes):
+        estimate = bucket_minutes(bucket_keys(signed))
+        assert np.all(np.abs(estimate - signed) <= TOLERANCE * np.abs(signed))
+    assert bucket_minutes(bucket_keys(np.array([0.0, SKETCH_MIN_MINUTES / 2]))).tolist() == [0.0, 0.0]
+
+
+def missions(count, seed):
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp('2025-05-05') + pd.to_timedelta(rng.integers(0, 10**6, count), unit='s')
+    wait = pd.to_timedelta(rng.lognormal(1, 1.5, count), unit='min').round('s')
+    frame = pd.DataFrame({
+        'month_key': 202505, 'mission_type': 'infeed', 'MISSION_STATUS': 'COMPLETED', 'PRODUCT_NAME': 'A',
+        'AREA_ID': rng.integers(1, 3, count), 'SHIFT_ID': 1, 'is_outlier': False, 'outlier_reason': '',
+        'created_datetime': created, 'start_datetime': created + wait,
+        'duration_minutes': rng.lognormal(0.5, 1, count),
+    })
+    frame.loc[::50, 'start_datetime'] = pd.NaT
+    return frame
+
+
+def exact_percentiles(values, percentiles):
+    """The value at the rank latency_percentiles reports for each percentile"""
+    values = np.sort(values[~np.isnan(values)])
+    return np.array([values[int(np.floor(p / 100 * (len(values) - 1)))] for p in percentiles])
+
+
+def test_percentiles_within_accuracy():
+    frame = missions(20000, seed=1)
+    percentiles = (1, 25, 50, 90, 95, 99, 100)
+    table = latency_percentiles(build_sketches(frame), by=['AREA_ID'], percentiles=percentiles)
+    wait = (frame['start_datetime'] - frame['created_datetime']).dt.total_seconds().to_numpy() / 60
+    latencies = {'wait': wait, 'execution': frame['duration_minutes'].to_numpy()}
+    assert len(table) == 4
+    for row in table.itertuples():
+        values = latencies[row.latency][frame['AREA_ID'].to_numpy() == row.AREA_ID]
+        assert row.missions == np.count_nonzero(~np.isnan(values))
+        exact = exact_percentiles(values, percentiles)
+        reported = np.array([getattr(row, f'p{p}') for p in percentiles])
+        assert np.all(np.abs(reported - exact) <= TOLERANCE * exact)
+
+
+def test_merged_sketches_match_a_single_build():
+    first, second = missions(5000, seed=2), missions(5000, seed=3)
+    merged = latency_percentiles(merge_sketches(build_sketches(first), build_sketches(second)), by=['AREA_ID'])
+    whole = latency_percentiles(build_sketches(pd.concat([first, second], ignore_index=True)), by=['AREA_ID'])
+    pd.testing.assert_frame_equal(merged, whole)
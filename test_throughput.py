@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from throughput import MAX_MISSION_MINUTES, rolling_throughput, sweep, throughput_hours
+
+
+def test_sweep_overlapping_intervals():
+    codes = np.array([0, 0, 0, 1, 1, 2, 2, 2])
+    start = np.array([0, 5, 20, 0, 10, 0, 10, 30])
+    end = np.array([10, 15, 30, 10, 20, 100, 20, 40])
+    busy, overlap, peak = sweep(codes, start, end, 4)
+    # Group 0: [0, 15] and [20, 30] busy, two missions at once in [5, 10]
+    # Group 1: back to back, never concurrent
+    # Group 2: two short missions nested in a long one
+    # Group 3: no missions
+    assert busy.tolist() == [25, 20, 100, 0]
+    assert overlap.tolist() == [30, 20, 120, 0]
+    assert peak.tolist() == [2, 1, 2, 0]
+
+
+def test_sweep_counts_identical_intervals():
+    busy, overlap, peak = sweep(np.zeros(3, dtype=int), np.full(3, 7), np.full(3, 9), 1)
+    assert (busy.tolist(), overlap.tolist(), peak.tolist()) == ([2], [6], [3])
+
+
+def test_sweep_without_intervals():
+    busy, overlap, peak = sweep(np.array([], dtype=int), np.array([]), np.array([]), 2)
+    assert (busy.tolist(), overlap.tolist(), peak.tolist()) == ([0, 0], [0, 0], [0, 0])
+
+
+def missions(rows):
+    """Missions of (area, end time, minutes) rows"""
+    frame = pd.DataFrame(rows, columns=['AREA_ID', 'end_datetime', 'minutes'])
+    frame['end_datetime'] = pd.to_datetime(frame['end_datetime'])
+    frame['start_datetime'] = frame['end_datetime'] - pd.to_timedelta(frame.pop('minutes'), unit='min')
+    frame['SHIFT_ID'] = 1
+    return frame
+
+
+ROWS = [
+    (1, '2025-05-05 00:30:00', 5),
+    (1, '2025-05-05 01:59:59', 5),
+    (1, '2025-05-05 02:00:00', 5),
+    (1, '2025-05-05 05:10:00', 5),
+    (2, '2025-05-05 03:00:00', 5),
+    # Too long to be a real mission
+    (2, '2025-05-05 04:00:00', MAX_MISSION_MINUTES + 1),
+]
+
+
+def test_rolling_throughput_window_edges():
+    rolling = rolling_throughput(missions(ROWS), window=2)
+    assert list(rolling.index) == list(pd.date_range('2025-05-05 00:00', periods=6, freq='h'))
+    assert len(rolling) == throughput_hours(missions(ROWS))
+    # An hour counts the missions ending in it and in the hour before
+    assert rolling[1].tolist() == [0.5, 1.0, 1.0, 0.5, 0.0, 0.5]
+    assert rolling[2].tolist() == [0.0, 0.0, 0.0, 0.5, 0.5, 0.0]
+
+
+def test_rolling_throughput_window_sizes():
+    hourly = rolling_throughput(missions(ROWS), window=1)
+    assert hourly[1].tolist() == [1, 1, 1, 0, 0, 1]
+    # A window longer than the axis averages everything up to each hour
+    wide = rolling_throughput(missions(ROWS), window=8)
+    assert (wide[1] * 8).tolist() == [1, 2, 3, 3, 3, 4]
+
+
+def test_rolling_throughput_without_missions():
+    rolling = rolling_throughput(missions(ROWS[-1:]))
+    assert rolling.empty and throughput_hours(missions(ROWS[-1:])) == 0
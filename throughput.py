@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from timeseries import NS_PER_HOUR
+
+# Mission columns the utilization engine reads
+THROUGHPUT_COLUMNS = ['AREA_ID', 'SHIFT_ID', 'start_datetime', 'end_datetime']
+
+# Missions running longer than this are taken as bad timestamps and left out,
+# as are missions without a start or end time or ending before they start
+MAX_MISSION_MINUTES = 60
+
+# Trailing window of the rolling missions per hour series
+ROLLING_HOURS = 8
+
+NS_PER_MINUTE = 60 * 10**9
+
+
+def _usable_intervals(missions):
+    """Mask of the missions with a usable interval, and every mission's start/end nanoseconds"""
+    start = missions['start_datetime'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    end = missions['end_datetime'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    valid = (
+        missions['start_datetime'].notna().to_numpy() & missions['end_datetime'].notna().to_numpy()
+        & (end >= start) & (end - start <= MAX_MISSION_MINUTES * NS_PER_MINUTE)
+    )
+    return valid, start, end
+
+
+def mission_intervals(missions, by=('AREA_ID',)):
+    """Group codes, groups and start/end nanoseconds of the missions with a usable interval
+
+    Returns (codes, groups, start, end): groups is a frame of the distinct
+    `by` values in sorted order and codes indexes it per interval.
+    """
+    valid, start, end = _usable_intervals(missions)
+    grouped = missions.loc[valid, list(by)].groupby(list(by), sort=True, observed=True, dropna=False)
+    codes = grouped.ngroup().to_numpy(dtype=np.int64)
+    groups = grouped.size().index.to_frame(index=False)
+    return codes, groups, start[valid], end[valid]
+
+
+def _group_starts(sorted_codes):
+    """Position of the first element of every run of equal codes"""
+    return np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+
+def sweep(codes, start, end, group_count):
+    """Busy time, concurrency integral and maximum concurrency per group
+
+    One sort of the 2n start (+1) and end (-1) events by group and time,
+    ends before starts at the same instant so back-to-back missions do not
+    overlap. The running sum of the sorted deltas is the number of missions
+    in progress after each event; it is back to zero after the last event
+    of every group, so one cumulative sum covers all groups. Returns
+    (busy_ns, overlap_ns, max_concurrent), overlap_ns being concurrency
+    integrated over time, i.e. the summed mission durations.
+    """
+    if len(codes) == 0:
+        return np.zeros(group_count), np.zeros(group_count), np.zeros(group_count, dtype=np.int64)
+    groups = np.concatenate([codes, codes]).astype(np.min_scalar_type(group_count))
+    times = np.concatenate([start, end])
+    is_start = np.arange(len(times)) < len(start)
+    # Time then end/start as one int64 key (quicksort: equal keys are the
+    # same kind of event at the same instant, their order does not matter),
+    # then a stable radix sort on the small group codes
+    order = np.argsort((times - times.min()) * 2 + is_start)
+    order = order[np.argsort(groups[order], kind='stable')]
+    groups, times = groups[order], times[order]
+    running = np.cumsum(np.where(order < len(start), 1, -1))
+
+    # Time to the next event, zero across a group boundary
+    gaps = np.diff(times).astype(float) * (groups[1:] == groups[:-1])
+    active = running[:-1]
+    busy = np.bincount(groups[:-1], weights=gaps * (active > 0), minlength=group_count)
+    overlap = np.bincount(groups[:-1], weights=gaps * active, minlength=group_count)
+    starts = _group_starts(groups)
+    peak = np.zeros(group_count, dtype=np.int64)
+    peak[groups[starts]] = np.maximum.reduceat(running, starts)
+    return busy, overlap, peak
+
+
+def _hour_slots(codes, times):
+    """Distinct (group, clock hour) slots of the times and the number of times in each"""
+    hours = times // NS_PER_HOUR
+    first, span = hours.min(), hours.max() - hours.min() + 1
+    slots, counts = np.unique(codes * span + (hours - first), return_counts=True)
+    return slots // span, counts
+
+
+def utilization(missions, by=('AREA_ID',)):
+    """Busy time, utilization, missions per hour and concurrency per area (and shift)
+
+    Operating hours are the clock hours in which a group started at least
+    one mission. Utilization (busy time over operating time) and missions
+    per hour are taken over those hours, so idle nights and weekends do not
+    dilute them.
+    """
+    codes, groups, start, end = mission_intervals(missions, by)
+    table = groups.copy()
+    busy, overlap, peak = sweep(codes, start, end, len(groups))
+    count = np.bincount(codes, minlength=len(groups))
+    operating = np.zeros(len(groups), dtype=np.int64)
+    peak_hourly = np.zeros(len(groups), dtype=np.int64)
+    if len(codes):
+        operating = np.bincount(_hour_slots(codes, start)[0], minlength=len(groups))
+        slot_groups, finished = _hour_slots(codes, end)
+        starts = _group_starts(slot_groups)
+        peak_hourly[slot_groups[starts]] = np.maximum.reduceat(finished, starts)
+
+    table['missions'] = count
+    table['busy_hours'] = busy / NS_PER_HOUR
+    table['operating_hours'] = operating
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['utilization'] = np.minimum(busy / (operating * NS_PER_HOUR) * 100, 100)
+        table['missions_per_hour'] = count / operating
+        table['avg_concurrent'] = overlap / busy
+    table['peak_missions_per_hour'] = peak_hourly
+    table['max_concurrent'] = peak
+    return table
+
+
+def throughput_hours(missions):
+    """Number of hours on the axis rolling_throughput returns for the missions"""
+    valid, _, end = _usable_intervals(missions)
+    if not valid.any():
+        return 0
+    hours = end[valid] // NS_PER_HOUR
+    return int(hours.max() - hours.min() + 1)
+
+
+def rolling_throughput(missions, by='AREA_ID', window=ROLLING_HOURS):
+    """Missions finished per hour, averaged over a trailing window, on a continuous hourly axis
+
+    Returns a frame indexed by hour with one column per value of `by`.
+    """
+    codes, groups, _, end = mission_intervals(missions, (by,))
+    if len(end) == 0:
+        return pd.DataFrame(columns=groups[by].tolist())
+    hours = end // NS_PER_HOUR
+    first, span = hours.min(), hours.max() - hours.min() + 1
+    counts = np.bincount(codes * span + (hours - first), minlength=len(groups) * span).reshape(len(groups), span)
+    totals = np.cumsum(counts, axis=1)
+    totals[:, window:] -= totals[:, :-window].copy()
+    index = pd.DatetimeIndex((first + np.arange(span)) * NS_PER_HOUR, name='hour')
+    return pd.DataFrame(totals.T / window, index=index, columns=groups[by].tolist())
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from ingest import format_month_key
+
+# Trend granularities offered in the sidebar and the bucket each one maps to
+GRANULARITIES = {'Hour': 'hour', 'Shift': 'shift', 'Day': 'day', 'Week': 'week', 'Month': 'month'}
+
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 24 * NS_PER_HOUR
+# 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday
+WEEK_OFFSET_DAYS = 3
+
+
+def bucket_keys(missions, granularity):
+    """Integer time bucket of every mission's creation time, -1 where it is missing
+
+    Keys sort chronologically: hours, days and weeks are counted from the
+    epoch, shifts are day * 10 + SHIFT_ID and months are year * 100 + month.
+    """
+    if granularity == 'month':
+        keys = missions['month_key'].to_numpy().astype(np.int64)
+        keys[keys == 0] = -1
+        return keys
+
+    created = missions['created_datetime']
+    missing = created.isna().to_numpy()
+    ns = created.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if granularity == 'hour':
+        keys = ns // NS_PER_HOUR
+    elif granularity == 'day':
+        keys = ns // NS_PER_DAY
+    elif granularity == 'week':
+        keys = (ns // NS_PER_DAY + WEEK_OFFSET_DAYS) // 7
+    elif granularity == 'shift':
+        shift = pd.to_numeric(missions['SHIFT_ID'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+        keys = (ns // NS_PER_DAY) * 10 + shift
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    keys[missing] = -1
+    return keys
+
+
+def format_buckets(keys, granularity):
+    """Axis labels for bucket keys"""
+    keys = np.asarray(keys, dtype=np.int64)
+    if granularity == 'month':
+        return [format_month_key(int(key)) for key in keys]
+    if granularity == 'hour':
+        return pd.to_datetime(keys * NS_PER_HOUR).strftime('%Y-%m-%d %H:00').tolist()
+    if granularity == 'day':
+        return pd.to_datetime(keys * NS_PER_DAY).strftime('%Y-%m-%d').tolist()
+    if granularity == 'week':
+        return pd.to_datetime((keys * 7 - WEEK_OFFSET_DAYS) * NS_PER_DAY).strftime('W/c %Y-%m-%d').tolist()
+    days = pd.to_datetime((keys // 10) * NS_PER_DAY).strftime('%Y-%m-%d')
+    return [f"{day} S{shift}" for day, shift in zip(days, keys % 10)]
+
+
+def aggregate(missions, granularity):
+    """Mission counts, completions, uptime and downtime per time bucket and mission type
+
+    The bucket and mission type codes are combined into one integer slot per
+    mission and every measure is a single np.bincount over those slots.
+    Buckets without missions of a type are left out.
+    """
+    keys = bucket_keys(missions, granularity)
+    valid = keys >= 0
+    types = missions['mission_type'].cat.categories
+    type_codes = missions['mission_type'].cat.codes.to_numpy()[valid]
+    completed = (missions['MISSION_STATUS'] == 'COMPLETED').to_numpy()[valid]
+
+    buckets, inverse = np.unique(keys[valid], return_inverse=True)
+    slots = inverse * len(types) + type_codes
+    size = len(buckets) * len(types)
+    total = np.bincount(slots, minlength=size)
+    done = np.bincount(slots, weights=completed, minlength=size).astype(np.int64)
+
+    series = pd.DataFrame({
+        'bucket': np.repeat(buckets, len(types)),
+        'mission_type': pd.Categorical.from_codes(np.tile(np.arange(len(types)), len(buckets)), categories=types),
+        'total': total,
+        'completed': done,
+    })
+    series = series[series['total'] > 0].reset_index(drop=True)
+    series['label'] = format_buckets(series['bucket'], granularity)
+    series['uptime'] = (series['completed'] / series['total'] * 100).round(2)
+    series['downtime'] = (100 - series['uptime']).round(2)
+    return series